@@ -1,7 +1,17 @@
-import tkinter as tk
-from src.gui import MainWindow
+import sys
+
 
 def main():
+    # 带参数时作为命令行运行 (见 src/cli.py)，不导入 Tkinter
+    if len(sys.argv) > 1:
+        from src.cli import main as cli_main
+        sys.exit(cli_main())
+
+    import tkinter as tk
+    from src.gui import MainWindow
+    from src.utils import setup_logger
+
+    setup_logger()
     root = tk.Tk()
     app = MainWindow(root)
     root.mainloop()
@@ -0,0 +1,236 @@
+"""
+吞吐量基准测试：启动本地模拟服务 (mock_kfz_server.py)，用 FreightBatchProcessor.run 跑一次完整任务，
+报告获取/修改阶段的 商品数/秒、峰值内存与各接口请求数
+
+    python scripts/benchmark.py --items 50000 --latency-ms 80
+    python scripts/benchmark.py --items 50000 --pipeline --fetch-workers 8 --json result.json
+    python scripts/benchmark.py --log-overhead 20000 2>/dev/null
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(ROOT, "scripts", "mock_kfz_server.py")
+
+DEFAULT_TEMPLATE = """价格下限,价格上限,运费模板名字
+0,5,0.1-5
+5.01,10,5-10
+10.01,9999,专用模板
+"""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="运费模板批量修改吞吐量基准测试")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=20000, help="模拟店铺的商品数")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--deep-page-ms", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0)
+    parser.add_argument("--bad-item-rate", type=float, default=0.001)
+    parser.add_argument("--poison-rate", type=float, default=0.0002)
+    parser.add_argument("--template", help="运费修改模板 CSV，默认使用与模拟服务运费模板对应的 3 个区间")
+    parser.add_argument("--fetch-workers", type=int, default=4)
+    parser.add_argument("--update-workers", type=int, default=2)
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--single-pass", action="store_true")
+    parser.add_argument("--mould-filter", action="store_true")
+    parser.add_argument("--no-skip-unchanged", action="store_true")
+    parser.add_argument("--log-mode", choices=("queue", "sync", "off"), default="off",
+                        help="客户端日志：queue 为后台线程写日志，sync 为在工作线程中同步写文件和控制台 (stderr)，"
+                             "off 只输出警告")
+    parser.add_argument("--log-level", default="INFO", help="--log-mode 不为 off 时的日志级别 (DEBUG 会记录请求数据)")
+    parser.add_argument("--log-overhead", type=int, metavar="N",
+                        help="不启动模拟服务，只测量 N 次批量修改日志 (INFO 一行 + DEBUG 请求数据) 在调用线程上的耗时")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    return parser
+
+
+def start_mock_server(args):
+    cmd = [sys.executable, MOCK_SERVER, "--port", str(args.port), "--items", str(args.items),
+           "--latency-ms", str(args.latency_ms), "--deep-page-ms", str(args.deep_page_ms),
+           "--error-rate", str(args.error_rate), "--rate-limit", str(args.rate_limit),
+           "--bad-item-rate", str(args.bad_item_rate), "--poison-rate", str(args.poison_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}/__stats"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("模拟服务启动失败")
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("等待模拟服务启动超时")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def phase(stats, endpoint):
+    s = stats.get(endpoint)
+    if not s:
+        return {"requests": 0, "errors": 0, "items": 0, "seconds": 0.0, "items_per_sec": 0.0}
+    seconds = max(s["last"] - s["first"], 1e-6)
+    return {
+        "requests": s["requests"],
+        "errors": s["errors"],
+        "items": s["items"],
+        "bytes": s["bytes"],
+        "seconds": round(seconds, 2),
+        "items_per_sec": round(s["items"] / seconds, 1)
+    }
+
+
+def run_benchmark(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    # 必须在导入 src 之前设置，接口地址在模块加载时读取
+    os.environ["KFZ_LOGIN_BASE_URL"] = base_url
+    os.environ["KFZ_SELLER_BASE_URL"] = base_url
+
+    workdir = tempfile.mkdtemp(prefix="kfz-bench-")
+    template_path = os.path.abspath(args.template) if args.template else os.path.join(workdir, "template.csv")
+    if not args.template:
+        with open(template_path, "w", encoding="utf-8-sig") as f:
+            f.write(DEFAULT_TEMPLATE)
+
+    # 输出目录与日志目录都放到临时目录，不污染仓库
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    from src.logic import FreightBatchProcessor
+    from src.utils import setup_logger, shutdown_logger
+    if args.log_mode == "off":
+        logging.getLogger("kfz_freight_editor").setLevel(logging.WARNING)
+    else:
+        # 控制台日志写到 stderr，可重定向到文件或 /dev/null 对比开销
+        setup_logger(level=args.log_level, stream=sys.stderr, use_queue=args.log_mode == "queue")
+
+    processor = FreightBatchProcessor(
+        fetch_workers=args.fetch_workers,
+        pipeline=args.pipeline,
+        update_workers=args.update_workers,
+        single_pass=args.single_pass,
+        skip_unchanged=not args.no_skip_unchanged,
+        mould_filter=args.mould_filter
+    )
+    started = time.time()
+    processor.run(template_path, "benchmark", "benchmark")
+    # 计入队列中尚未写完的日志
+    shutdown_logger()
+    elapsed = time.time() - started
+
+    stats = json.loads(urllib.request.urlopen(base_url + "/__stats", timeout=5).read())
+    # 客户端记录的性能指标 (各接口延迟分位数、限速等待、本地 CSV 写入耗时)
+    client_metrics = None
+    output_dir = os.path.join(workdir, "output")
+    if os.path.isdir(output_dir):
+        for name in sorted(os.listdir(output_dir), reverse=True):
+            path = os.path.join(output_dir, name, "metrics.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    client_metrics = json.load(f)
+                break
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "workdir": workdir,
+        "total_seconds": round(elapsed, 2),
+        "fetch": phase(stats, "list"),
+        "update": phase(stats, "update"),
+        "requests": {endpoint: s["requests"] for endpoint, s in stats.items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1) if peak_rss_mb() is not None else None,
+        "client_metrics": client_metrics
+    }
+
+
+def run_log_overhead(calls):
+    """对比同步写日志与队列日志在调用线程上的耗时，以及 INFO / DEBUG 级别下请求数据日志的开销"""
+    workdir = tempfile.mkdtemp(prefix="kfz-bench-log-")
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    from src.utils import setup_logger, shutdown_logger
+
+    data = {"updateType": "mouldId", "itemIds": list(range(10_000_000, 10_000_200)), "value": "123456",
+            "itemUnit": "0.5", "modifyType": "all"}
+    result = {"calls": calls, "workdir": workdir}
+    for mode in ("sync", "queue"):
+        for level in ("INFO", "DEBUG"):
+            logger = logging.getLogger("kfz_freight_editor")
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+            setup_logger(level=level, stream=sys.stderr, use_queue=mode == "queue")
+            started = time.perf_counter()
+            for _ in range(calls):
+                logger.info("正在批量更新 %d 个商品到模板 %s", len(data["itemIds"]), data["value"])
+                logger.debug("请求数据: %s", data)
+            caller = time.perf_counter() - started
+            shutdown_logger()
+            total = time.perf_counter() - started
+            result[f"{mode}_{level}"] = {"caller_us_per_call": round(caller / calls * 1e6, 1),
+                                         "total_seconds": round(total, 2)}
+            print(f"{mode:5s} {level:5s}: 调用线程 {caller / calls * 1e6:.1f} 微秒/次，"
+                  f"含写完队列共 {total:.2f} 秒")
+    return result
+
+
+def print_report(result):
+    fetch, update = result["fetch"], result["update"]
+    print("=" * 50)
+    print(f"总耗时: {result['total_seconds']} 秒  (输出目录: {result['workdir']})")
+    print(f"获取: {fetch['items']} 条 / {fetch['seconds']} 秒 = {fetch['items_per_sec']} 条/秒 "
+          f"(请求 {fetch['requests']} 次, 错误 {fetch['errors']} 次)")
+    print(f"修改: {update['items']} 条 / {update['seconds']} 秒 = {update['items_per_sec']} 条/秒 "
+          f"(请求 {update['requests']} 次, 错误 {update['errors']} 次)")
+    print(f"各接口请求数: {result['requests']}")
+    print(f"峰值内存: {result['peak_rss_mb']} MB")
+    metrics = result.get("client_metrics")
+    if metrics:
+        for name, e in metrics["endpoints"].items():
+            lat = e["latency"]
+            print(f"客户端 {name}: p50/p95/p99 = {lat['p50_ms']}/{lat['p95_ms']}/{lat['p99_ms']} ms, "
+                  f"限速等待 {e['throttle_wait_seconds']} 秒")
+        for name, seconds in metrics["timers"].items():
+            print(f"客户端 {name}: {seconds} 秒")
+    print("=" * 50)
+
+
+def main():
+    args = build_parser().parse_args()
+    # run_benchmark 会切换工作目录，结果文件按启动时的目录解析
+    json_path = os.path.abspath(args.json) if args.json else None
+    if args.log_overhead:
+        result = run_log_overhead(args.log_overhead)
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        return
+    server = start_mock_server(args)
+    try:
+        result = run_benchmark(args)
+    finally:
+        server.terminate()
+        server.wait()
+    print_report(result)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import os
 import subprocess
 import sys
+import tomllib
+
+def project_version():
+    with open("pyproject.toml", "rb") as f:
+        return tomllib.load(f)["project"]["version"]
 
 def build():
     main_script = "main.py"
@@ -10,6 +15,8 @@ def build():
         sys.executable, "-m", "nuitka",
         "--standalone",
         "--onefile",
+        # 单文件程序解压到按版本区分的缓存目录，之后启动直接复用，不必每次解压到临时目录
+        f"--onefile-tempdir-spec={{CACHE_DIR}}/kfz-freight-editor/{project_version()}",
         "--enable-plugin=tk-inter",
         f"--output-dir={output_dir}",
         "--remove-output",
@@ -0,0 +1,356 @@
+"""
+孔网接口本地模拟服务，用于离线压测与回归测试
+
+实现 接口说明.md 中的登录、getBaseSelectData、unSold/list、batchUpdate 四个接口，
+商品数据为按随机种子生成的虚拟店铺，可配置规模、延迟、错误率和限流。
+
+    python scripts/mock_kfz_server.py --items 50000 --latency-ms 80 --error-rate 0.01
+
+客户端通过环境变量指向本服务:
+    KFZ_LOGIN_BASE_URL=http://127.0.0.1:8765
+    KFZ_SELLER_BASE_URL=http://127.0.0.1:8765
+
+额外的管理接口:
+    GET  /__stats   各接口请求数、错误数、首末请求时间、获取/修改的商品数
+    POST /__reset   恢复初始商品数据并清空统计
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GOODS_API_PATH = "/pc-gw/book-manage-service/client/pc/goods"
+
+MOULDS = [
+    {"feeManner": "weightPiece", "mouldId": 629501, "mouldName": "模板1", "mouldType": 0},
+    {"feeManner": "weight", "mouldId": 821270, "mouldName": "0.1-5", "mouldType": 0},
+    {"feeManner": "weight", "mouldId": 821271, "mouldName": "5-10", "mouldType": 0},
+    {"feeManner": "weight", "mouldId": 821914, "mouldName": "模板2", "mouldType": 0},
+    {"feeManner": "weight", "mouldId": 943965, "mouldName": "专用模板", "mouldType": 0},
+]
+QUALITIES = [(100, "全新"), (95, "九五品"), (90, "九品"), (85, "八五品"), (80, "八品"), (70, "七品")]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def generate_catalog(size, seed):
+    """生成虚拟店铺商品，字段与真实接口返回一致 (含导出时用不到的字段)"""
+    rng = random.Random(seed)
+    base_time = datetime(2025, 1, 1)
+    items = []
+    for i in range(size):
+        mould = rng.choice(MOULDS)
+        quality, quality_name = rng.choice(QUALITIES)
+        # 旧书价格大多集中在低价区间
+        price = round(min(9999.0, max(0.01, rng.lognormvariate(1.5, 1.0))), 2)
+        created = base_time + timedelta(minutes=rng.randrange(0, 600 * 24 * 60))
+        items.append({
+            "name": f"模拟商品 {i}",
+            "qualityName": quality_name,
+            "quality": quality,
+            "price": price,
+            "realPrice": price,
+            "number": 1,
+            "mouldName": mould["mouldName"],
+            "feeManner": "0.5千克",
+            "weight": 0.5,
+            "weightPiece": 1.0,
+            "mouldId": mould["mouldId"],
+            "imageUrl": f"https://www0.kfzimg.com/sw/kfz-cos/kfzimg/0/{i:016x}_s.jpg",
+            "imageSrc": f"https://www0.kfzimg.com/sw/kfz-cos/kfzimg/0/{i:016x}_s.jpg",
+            "createTime": created.strftime(TIME_FORMAT),
+            "updateTime": created.strftime(TIME_FORMAT),
+            "itemId": 8800000000 + i,
+            "catId": 31000000000000000,
+            "catName": "计算机与互联网",
+            "tpl": 13,
+            "itemSn": f"SN{i:07d}",
+            "discount": 100,
+            "certifyStatus": "certified",
+            "isOnSale": 1,
+            "certifyStatusName": "出售中",
+            "isSyncISBN": 1,
+            "deliverType": 1,
+            "deliverTime": "48h",
+            "isDraft": 0,
+        })
+    return items
+
+
+class MockState:
+    """模拟服务的全部状态，请求处理线程共享"""
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.rng = random.Random(args.seed + 1)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.items = generate_catalog(self.args.items, self.args.seed)
+            self.by_id = {item["itemId"]: item for item in self.items}
+            rng = random.Random(self.args.seed + 2)
+            ids = list(self.by_id)
+            # 永远修改失败 (出现在 failIds) 的商品，以及会让整批请求报错的商品
+            self.bad_ids = set(rng.sample(ids, int(len(ids) * self.args.bad_item_rate)))
+            self.poison_ids = set(rng.sample(ids, int(len(ids) * self.args.poison_rate)))
+            self.sessions = {}
+            self.stats = {}
+            self.buckets = {}
+
+    def record(self, endpoint, ok, items=0, nbytes=0):
+        with self.lock:
+            s = self.stats.setdefault(endpoint, {
+                "requests": 0, "errors": 0, "items": 0, "bytes": 0, "first": None, "last": None})
+            now = time.time()
+            s["requests"] += 1
+            s["errors"] += 0 if ok else 1
+            s["items"] += items
+            s["bytes"] += nbytes
+            s["first"] = s["first"] or now
+            s["last"] = now
+
+    def throttled(self, endpoint):
+        """按接口的令牌桶限流，超过 --rate-limit 次/秒时返回 True"""
+        limit = self.args.rate_limit
+        if not limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            tokens, last = self.buckets.get(endpoint, (limit, now))
+            tokens = min(limit, tokens + (now - last) * limit)
+            if tokens < 1:
+                self.buckets[endpoint] = (tokens, now)
+                return True
+            self.buckets[endpoint] = (tokens - 1, now)
+            return False
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(body or b"{}")
+        return body.decode("utf-8")
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def _ok(self, result):
+        return self._send(200, {"status": True, "errCode": 0, "errMessage": "", "result": result})
+
+    def _session_valid(self):
+        cookie = self.headers.get("Cookie") or ""
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "PHPSESSID":
+                expires = self.state.sessions.get(value)
+                return expires is not None and time.time() < expires
+        return False
+
+    def _simulate(self, endpoint, page=1):
+        """
+        模拟网络延迟、限流、随机错误与登录失效
+        :return: 已发送错误响应时返回 True
+        """
+        args = self.state.args
+        delay = (args.latency_ms + args.deep_page_ms * max(0, page - 1)) / 1000.0
+        if delay:
+            time.sleep(delay * self.state.rng.uniform(0.8, 1.2))
+        if self.state.throttled(endpoint):
+            self.state.record(endpoint, False)
+            self._send(429, {"status": False, "errCode": 429, "errMessage": "请求过于频繁"})
+            return True
+        if self.state.rng.random() < args.error_rate:
+            self.state.record(endpoint, False)
+            self._send(500, {"status": False, "errCode": 500, "errMessage": "Internal Server Error"})
+            return True
+        if not self._session_valid():
+            self.state.record(endpoint, False)
+            self._send(200, {"status": False, "errCode": 1001, "errMessage": "登录已失效，请重新登录"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/__stats":
+            with self.state.lock:
+                stats = json.loads(json.dumps(self.state.stats))
+            self._send(200, stats)
+        elif self.path == GOODS_API_PATH + "/getBaseSelectData":
+            if self._simulate("base"):
+                return
+            nbytes = self._ok({"mouldList": MOULDS, "shopId": 900494, "shopName": "模拟书店"})
+            self.state.record("base", True, nbytes=nbytes)
+        else:
+            self._send(404, {"status": False, "errCode": 404, "errMessage": "Not Found"})
+
+    def do_POST(self):
+        if self.path == "/__reset":
+            self._read_json()
+            self.state.reset()
+            self._send(200, {"status": True})
+        elif self.path.startswith("/Pc/Login/account"):
+            self._login()
+        elif self.path == GOODS_API_PATH + "/unSold/list":
+            self._unsold_list()
+        elif self.path == GOODS_API_PATH + "/batchUpdate":
+            self._batch_update()
+        else:
+            self._send(404, {"status": False, "errCode": 404, "errMessage": "Not Found"})
+
+    def _login(self):
+        self._read_json()
+        token = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.sessions[token] = time.time() + self.state.args.session_ttl
+        nbytes = self._send(200, {"status": True, "errCode": 0},
+                            headers={"Set-Cookie": f"PHPSESSID={token}; path=/"})
+        self.state.record("login", True, nbytes=nbytes)
+
+    def _unsold_list(self):
+        data = self._read_json()
+        page = int(data.get("page") or 1)
+        size = int(data.get("size") or 50)
+        if self._simulate("list", page):
+            return
+
+        price_min = float(data["priceMin"]) if data.get("priceMin") not in ("", None) else None
+        price_max = float(data["priceMax"]) if data.get("priceMax") not in ("", None) else None
+        mould = str(data.get("shippingMould") or "")
+        start_update, end_update = data.get("startUpdateTime") or "", data.get("endUpdateTime") or ""
+        start_create = data.get("startCreateTime") or ""
+
+        def match(item):
+            if price_min is not None and item["price"] < price_min:
+                return False
+            if price_max is not None and item["price"] > price_max:
+                return False
+            if mould and str(item["mouldId"]) != mould:
+                return False
+            if start_update and item["updateTime"] < start_update:
+                return False
+            if end_update and item["updateTime"] > end_update:
+                return False
+            if start_create and item["createTime"] < start_create:
+                return False
+            return True
+
+        with self.state.lock:
+            matched = [item for item in self.state.items if match(item)]
+            page_items = [dict(item) for item in matched[(page - 1) * size:page * size]]
+        total = len(matched)
+        nbytes = self._ok({
+            "productInfoPageResult": {
+                "list": page_items,
+                "pager": {"page": page, "size": size, "total": total, "pages": (total + size - 1) // size}
+            },
+            "productListStat": {"count": total, "itemNum": total}
+        })
+        self.state.record("list", True, items=len(page_items), nbytes=nbytes)
+
+    def _batch_update(self):
+        data = self._read_json()
+        if self._simulate("update"):
+            return
+        item_ids = [int(x) for x in data.get("itemIds", [])]
+        mould_id = int(data.get("value"))
+        mould_name = next((m["mouldName"] for m in MOULDS if m["mouldId"] == mould_id), None)
+        if mould_name is None:
+            self.state.record("update", False)
+            self._send(200, {"status": False, "errCode": 2001, "errMessage": "运费模板不存在"})
+            return
+
+        with self.state.lock:
+            if any(iid in self.state.poison_ids for iid in item_ids):
+                poisoned = True
+            else:
+                poisoned = False
+                success_ids, fail_ids = [], []
+                lost = False
+                now = datetime.now().strftime(TIME_FORMAT)
+                for iid in item_ids:
+                    item = self.state.by_id.get(iid)
+                    if item is None or iid in self.state.bad_ids:
+                        fail_ids.append(str(iid))
+                        continue
+                    if self.state.rng.random() < self.state.args.lost_update_rate:
+                        # 未生效却没有报告失败的修改，复核 (--verify) 时应能发现
+                        lost = True
+                        continue
+                    item["mouldId"] = mould_id
+                    item["mouldName"] = mould_name
+                    item["updateTime"] = now
+                    success_ids.append(str(iid))
+        if poisoned:
+            self.state.record("update", False)
+            self._send(200, {"status": False, "errCode": 2002, "errMessage": "商品状态异常，批量修改失败"})
+            return
+        if lost:
+            # 不返回 successIds/failIds，客户端只能按整批成功处理
+            nbytes = self._ok({"message": "修改成功"})
+        else:
+            nbytes = self._ok({
+                "successIds": success_ids,
+                "failIds": fail_ids,
+                "message": f"成功{len(success_ids)}件，失败{len(fail_ids)}件"
+            })
+        self.state.record("update", True, items=len(success_ids), nbytes=nbytes)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="孔网接口本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=20000, help="虚拟店铺的商品数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=50, help="每个请求的基础延迟")
+    parser.add_argument("--deep-page-ms", type=float, default=0.5, help="列表接口每深一页增加的延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 HTTP 500 的概率")
+    parser.add_argument("--rate-limit", type=float, default=0, help="每个接口每秒允许的请求数，超过返回 429，0 为不限")
+    parser.add_argument("--bad-item-rate", type=float, default=0.001, help="修改总是失败 (failIds) 的商品比例")
+    parser.add_argument("--poison-rate", type=float, default=0.0002, help="会让整批修改报错的商品比例")
+    parser.add_argument("--lost-update-rate", type=float, default=0.0,
+                        help="修改未生效、接口却不返回 successIds/failIds 的商品比例")
+    parser.add_argument("--session-ttl", type=float, default=3600, help="登录会话有效期 (秒)")
+    return parser
+
+
+def make_server(args):
+    handler = type("Handler", (MockHandler,), {"state": MockState(args)})
+    return ThreadingHTTPServer((args.host, args.port), handler)
+
+
+def main():
+    args = build_parser().parse_args()
+    server = make_server(args)
+    host, port = server.server_address
+    print(f"模拟服务已启动: http://{host}:{port} (商品数 {args.items})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+启动耗时基准测试：每个场景启动一个新的 Python 进程，测量 进程总耗时 与 入口模块导入耗时 (取中位数)，
+并检查导入后是否已加载 requests / tkinter、是否在工作目录创建了 logs/
+
+    python scripts/startup_benchmark.py
+    python scripts/startup_benchmark.py --runs 20 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 场景名 -> 子进程中执行的导入语句
+SCENARIOS = {
+    "命令行 --help": "import sys; sys.argv = ['kfz-freight', '--help']\ntry:\n    from src.cli import main; main()\nexcept SystemExit:\n    pass",
+    "命令行入口模块": "import src.cli",
+    "GUI 入口模块 (不创建窗口)": "import tkinter, src.gui",
+    "业务逻辑模块": "import src.logic",
+}
+
+CHILD = """
+import contextlib, io, json, os, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    exec({code!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_ms": elapsed * 1000, "requests": "requests" in sys.modules, "tkinter": "tkinter" in sys.modules,
+        "logs_dir": os.path.exists("logs")}}))
+"""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="命令行 / GUI 启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="每个场景运行的次数")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    return parser
+
+
+def measure(code, runs):
+    totals, imports, last = [], [], None
+    for _ in range(runs):
+        # 每次在新的临时目录中运行，检查导入是否有创建目录等副作用
+        with tempfile.TemporaryDirectory(prefix="kfz-startup-") as workdir:
+            started = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, code=code)], cwd=workdir,
+                                 capture_output=True, text=True, check=True).stdout
+        totals.append((time.perf_counter() - started) * 1000)
+        last = json.loads(out.strip().splitlines()[-1])
+        imports.append(last["import_ms"])
+    return {
+        "process_ms": round(statistics.median(totals), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "loads_requests": last["requests"],
+        "loads_tkinter": last["tkinter"],
+        "creates_logs_dir": last["logs_dir"]
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    baseline = measure("pass", args.runs)["process_ms"]
+    results = {"interpreter_ms": baseline}
+    print(f"空解释器启动: {baseline} ms")
+    for name, code in SCENARIOS.items():
+        result = measure(code, args.runs)
+        results[name] = result
+        print(f"{name}: 进程 {result['process_ms']} ms, 导入 {result['import_ms']} ms, "
+              f"requests={result['loads_requests']}, tkinter={result['loads_tkinter']}, "
+              f"创建 logs/={result['creates_logs_dir']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
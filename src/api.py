@@ -1,34 +1,167 @@
+import os
+import threading
+import time
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from .metrics import RunMetrics
+from .ratelimit import AdaptiveRateLimiter
 from .utils import logger
 
+# 卖家后台接口地址，可通过环境变量指向本地模拟服务 (scripts/mock_kfz_server.py)
+SELLER_BASE_URL = os.environ.get("KFZ_SELLER_BASE_URL", "https://seller.kongfz.com")
+GOODS_API_PATH = "/pc-gw/book-manage-service/client/pc/goods"
+# 表示登录已失效的 errCode；此外 HTTP 401 与被重定向到登录页也视为登录失效
+SESSION_EXPIRED_CODES = {1001}
+# 与批次中的商品无关、整批必然失败的批量修改 errCode (2001: 运费模板不存在)，不拆分重试
+BATCH_ERROR_CODES = {2001}
+# 单个请求因登录失效最多重试的次数 (每次重试前重新登录或沿用其他线程刚登录的会话)
+SESSION_RETRIES = 2
+
+
+class SessionExpiredError(Exception):
+    """登录已失效且重新登录失败"""
+
+
+class ApiError(str):
+    """
+    接口失败时返回的错误信息，用法与原来的错误字符串相同，另外区分失败原因：
+    - transport: 网络错误、超时、HTTP 错误 (含 429) 等请求本身的失败
+    - err_code: 服务端正常返回的业务错误码，transport 失败时为 None
+    """
+
+    def __new__(cls, message, err_code=None, transport=False):
+        error = super().__new__(cls, message)
+        error.err_code = err_code
+        error.transport = transport
+        return error
+
+
 class KfzClient:
-    def __init__(self, session: requests.Session):
+    def __init__(self, session: requests.Session, pool_size: int = 10, rate_limiter: AdaptiveRateLimiter = None,
+                 metrics: RunMetrics = None, relogin=None):
+        """
+        :param session: 已登录 (或恢复了缓存 cookie) 的 session
+        :param pool_size: 连接池大小，并发获取时所有线程共用同一个 session 的连接池
+        :param rate_limiter: 限速器，同一账号应共用一个实例 (见 ratelimit.get_rate_limiter)
+        :param metrics: 性能指标，记录各接口的请求数、错误数、流量、延迟与限速等待时间
+        :param relogin: 登录失效时调用的重新登录函数，返回 (bool, 消息)；为空时不重新登录
+        """
         self.session = session
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.metrics = metrics or RunMetrics()
+        self.base_url = SELLER_BASE_URL + GOODS_API_PATH
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.relogin = relogin
+        # 每次重新登录成功后加 1；多个线程同时发现失效时只有第一个重新登录，其余直接重试
+        self.session_generation = 0
+        self.relogin_error = None
+        self._session_lock = threading.Lock()
+
+    def _is_session_expired(self, response):
+        if response.status_code == 401:
+            return True
+        # 未登录的请求可能被重定向到登录页 (返回 HTML 而不是 JSON)
+        return bool(response.history) and "login" in response.url.lower()
+
+    def _renew_session(self, generation):
+        """
+        登录失效时重新登录 (多线程共用一个 session，只登录一次)
+        :param generation: 发出请求时的 session_generation
+        :return: 是否可以用新会话重试
+        """
+        with self._session_lock:
+            if self.session_generation != generation:
+                return True
+            if self.relogin is None or self.relogin_error is not None:
+                return False
+            success, msg = self.relogin()
+            if not success:
+                # 重新登录失败 (如密码已修改) 时不再反复尝试
+                self.relogin_error = msg
+                return False
+            self.session_generation += 1
+            return True
+
+    def _request(self, kind, endpoint, method, url, timeout=15, **kwargs):
+        """
+        发送请求；登录失效时重新登录并重试，调用方不需要处理
+        :return: (bool, result/错误信息)；重新登录失败时抛出 SessionExpiredError
+        """
+        for _ in range(SESSION_RETRIES + 1):
+            generation = self.session_generation
+            result = self._send(kind, endpoint, method, url, timeout, **kwargs)
+            if result is not None:
+                return result
+            if not self._renew_session(generation):
+                break
+        raise SessionExpiredError(f"登录已失效，重新登录失败: {self.relogin_error}" if self.relogin_error
+                                  else "登录已失效")
+
+    def _send(self, kind, endpoint, method, url, timeout, **kwargs):
+        """
+        经过限速器发送请求，并把结果反馈给限速器
+        HTTP 错误、超时、errCode != 0 都视为失败，触发退避；其中只有 HTTP 错误与超时会降低速率
+        登录失效不触发退避 (与请求速率无关)
+        :param kind: 限速类别 list / update
+        :param endpoint: 性能指标中的接口名
+        :return: (bool, result/错误信息)；登录失效时返回 None
+        """
+        waited = time.perf_counter()
+        self.rate_limiter.acquire(kind)
+        started = time.perf_counter()
+        self.metrics.record_wait(endpoint, started - waited)
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+            if self._is_session_expired(response):
+                self.metrics.record_request(endpoint, time.perf_counter() - started, False)
+                return None
+            response.raise_for_status()
+            res_json = response.json()
+        except Exception:
+            self.metrics.record_request(endpoint, time.perf_counter() - started, False)
+            backoff = self.rate_limiter.on_failure(kind)
+            logger.warning("请求失败，%s 接口退避 %.1f 秒", kind, backoff)
+            raise
+
+        if res_json.get("errCode") in SESSION_EXPIRED_CODES:
+            self.metrics.record_request(endpoint, time.perf_counter() - started, False)
+            logger.warning("登录已失效 (errCode=%s)", res_json.get('errCode'))
+            return None
+        ok = bool(res_json.get("status")) and res_json.get("errCode") == 0
+        self.metrics.record_request(endpoint, time.perf_counter() - started, ok,
+                                    len(response.request.body or b''), len(response.content))
+        if ok:
+            self.rate_limiter.on_success(kind)
+            return True, res_json.get("result", {})
+        # 服务端正常返回了业务错误：退避但不降速，避免个别问题商品拖慢整个任务
+        backoff = self.rate_limiter.on_failure(kind, slow_down=False)
+        logger.warning("接口返回错误 errCode=%s，%s 接口退避 %.1f 秒", res_json.get('errCode'), kind, backoff)
+        return False, ApiError(res_json.get("errMessage", "Unknown Error"), err_code=res_json.get("errCode"))
 
     def get_base_select_data(self):
         """
         获取基础选项数据，包含运费模板列表
         """
-        url = 'https://seller.kongfz.com/pc-gw/book-manage-service/client/pc/goods/getBaseSelectData'
+        url = f'{self.base_url}/getBaseSelectData'
         try:
             logger.info("正在获取运费模板配置...")
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            res_json = response.json()
-            if res_json.get("status") and res_json.get("errCode") == 0:
-                return True, res_json.get("result", {})
-            else:
-                return False, res_json.get("errMessage", "Unknown Error")
+            return self._request("list", "getBaseSelectData", "GET", url)
         except Exception as e:
-            logger.error(f"获取基础配置失败: {e}")
-            return False, str(e)
+            logger.error("获取基础配置失败: %s", e)
+            return False, ApiError(str(e), transport=True)
 
-    def get_unsold_list(self, price_min, price_max, page=1, size=200):
+    def get_unsold_list(self, price_min, price_max, page=1, size=200, shipping_mould="",
+                        start_update_time="", end_update_time="", start_create_time=""):
         """
         获取出售中的商品列表
+        :param shipping_mould: 只返回使用该运费模板 ID 的商品，为空时不筛选
+        :param start_update_time: 更新时间起 (YYYY-MM-DD HH:MM:SS)，与 end_update_time 配合做增量获取
+        :param start_create_time: 创建时间起，用于获取新上架的商品
         """
-        url = 'https://seller.kongfz.com/pc-gw/book-manage-service/client/pc/goods/unSold/list'
+        url = f'{self.base_url}/unSold/list'
         data = {
             "requestType": "onSale",
             "name": "",
@@ -38,10 +171,10 @@ class KfzClient:
             "catId": "",
             "priceMin": str(price_min),
             "priceMax": str(price_max),
-            "startCreateTime": "",
+            "startCreateTime": start_create_time,
             "endCreateTime": "",
             "itemSn": "",
-            "shippingMould": "",
+            "shippingMould": str(shipping_mould),
             "quality": "",
             "isbn": "",
             "certifyStatus": "",
@@ -53,8 +186,8 @@ class KfzClient:
             "noStock": False,
             "soldTimeBegin": "",
             "soldTimeEnd": "",
-            "startUpdateTime": "",
-            "endUpdateTime": "",
+            "startUpdateTime": start_update_time,
+            "endUpdateTime": end_update_time,
             "sortField": "",
             "sortOrder": "",
             "isItemSnEqual": 0,
@@ -63,17 +196,11 @@ class KfzClient:
         }
 
         try:
-            # logger.debug(f"Fetch items page {page}: {price_min}-{price_max}")
-            response = self.session.post(url, json=data, timeout=15)
-            response.raise_for_status()
-            res_json = response.json()
-            if res_json.get("status") and res_json.get("errCode") == 0:
-                return True, res_json.get("result", {})
-            else:
-                return False, res_json.get("errMessage", "Unknown Error")
+            logger.debug("获取商品列表 %s - %s 第 %s 页: %s", price_min, price_max, page, data)
+            return self._request("list", "unSold/list", "POST", url, json=data)
         except Exception as e:
-            logger.error(f"获取商品列表失败: {e}")
-            return False, str(e)
+            logger.error("获取商品列表失败: %s", e)
+            return False, ApiError(str(e), transport=True)
 
     def batch_update_freight(self, item_ids: list, mould_id: str, item_unit: str = "0.5"):
         """
@@ -82,7 +209,7 @@ class KfzClient:
         :param mould_id: 目标运费模板 ID
         :param item_unit: 商品物流重量 (API该字段似乎必填，默认为0.5)
         """
-        url = 'https://seller.kongfz.com/pc-gw/book-manage-service/client/pc/goods/batchUpdate'
+        url = f'{self.base_url}/batchUpdate'
         data = {
             "updateType": "mouldId",
             "itemIds": item_ids,
@@ -90,20 +217,12 @@ class KfzClient:
             "itemUnit": str(item_unit),
             "modifyType": "all"
         }
-        
+
         try:
-            logger.info(f"正在批量更新 {len(item_ids)} 个商品到模板 {mould_id}")
-            logger.info(f"请求数据: {data}")
-            import time
-            time.sleep(0.262)
-            return True, {"success": True}
-            # response = self.session.post(url, json=data, timeout=30)
-            # response.raise_for_status()
-            # res_json = response.json()
-            # if res_json.get("status") and res_json.get("errCode") == 0:
-            #     return True, res_json.get("result", {})
-            # else:
-            #     return False, res_json.get("errMessage", "Unknown Error")
+            logger.info("正在批量更新 %d 个商品到模板 %s", len(item_ids), mould_id)
+            # 请求数据 (200 个 itemId) 只在 DEBUG 级别记录，且由日志线程按需格式化
+            logger.debug("请求数据: %s", data)
+            return self._request("update", "batchUpdate", "POST", url, json=data, timeout=30)
         except Exception as e:
-            logger.error(f"批量更新失败: {e}")
-            return False, str(e)
+            logger.error("批量更新失败: %s", e)
+            return False, ApiError(str(e), transport=True)
@@ -0,0 +1,97 @@
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR
+
+# 孔网商品价格精确到分
+PRICE_STEP = Decimal("0.01")
+
+
+def to_price(value):
+    """把 CSV/接口中的价格转换为 Decimal，浮点数先转字符串避免二进制误差"""
+    return Decimal(str(value).strip())
+
+
+def to_cents(value, upper=False):
+    """
+    价格转换为以分为单位的整数
+    不足一分的区间边界：下限向上取整，上限 (upper=True) 向下取整
+    :raises ValueError: 价格无法解析
+    """
+    try:
+        price = to_price(value)
+    except InvalidOperation:
+        raise ValueError(f"价格格式错误: {value}")
+    rounding = ROUND_FLOOR if upper else ROUND_CEILING
+    return int((price * 100).to_integral_value(rounding=rounding))
+
+
+def from_cents(cents):
+    """以分为单位的整数转换为接口使用的价格字符串，如 1234 -> 12.34"""
+    return str(Decimal(cents) / 100)
+
+
+class PriceBandIndex:
+    """
+    价格区间索引：把模板行按价格下限排序，用二分查找定位商品所属区间
+    边界按 Decimal 精确比较，区间两端均为闭区间 (与接口 priceMin/priceMax 一致)
+    """
+
+    def __init__(self, rows):
+        """
+        :param rows: 模板 CSV 行 (含 价格下限/价格上限 列)
+        :raises ValueError: 价格无法解析、下限大于上限或区间重叠
+        """
+        bands = []
+        for i, row in enumerate(rows):
+            try:
+                low = to_price(row['价格下限'])
+                high = to_price(row['价格上限'])
+            except (InvalidOperation, TypeError):
+                raise ValueError(f"第 {i + 2} 行价格格式错误: {row['价格下限']} - {row['价格上限']}")
+            if low > high:
+                raise ValueError(f"第 {i + 2} 行价格下限大于上限: {low} - {high}")
+            bands.append((low, high, i))
+        bands.sort()
+
+        for prev, cur in zip(bands, bands[1:]):
+            if cur[0] <= prev[1]:
+                raise ValueError(
+                    f"价格区间重叠: 第 {prev[2] + 2} 行 {prev[0]}-{prev[1]} 与 第 {cur[2] + 2} 行 {cur[0]}-{cur[1]}")
+
+        self.lows = [b[0] for b in bands]
+        self.highs = [b[1] for b in bands]
+        self.rows = [b[2] for b in bands]
+        # 以分为单位的边界 (下限向上取整、上限向下取整)，商品价格已是整数分时直接比较整数
+        self.low_cents = [to_cents(low) for low in self.lows]
+        self.high_cents = [to_cents(high, upper=True) for high in self.highs]
+
+    def lookup(self, price):
+        """
+        :return: 价格所属模板行的序号，不属于任何区间时返回 None
+        """
+        price = to_price(price)
+        pos = bisect_right(self.lows, price) - 1
+        if pos >= 0 and price <= self.highs[pos]:
+            return self.rows[pos]
+        return None
+
+    def lookup_cents(self, cents):
+        """
+        与 lookup 相同，价格为以分为单位的整数 (ItemRecord.price_cents)
+        """
+        if cents is None:
+            return None
+        pos = bisect_right(self.low_cents, cents) - 1
+        if pos >= 0 and cents <= self.high_cents[pos]:
+            return self.rows[pos]
+        return None
+
+    def gaps(self):
+        """
+        相邻区间之间未覆盖的价格段
+        :return: [(起, 止)]
+        """
+        result = []
+        for high, next_low in zip(self.highs, self.lows[1:]):
+            if next_low - high > PRICE_STEP:
+                result.append((high + PRICE_STEP, next_low - PRICE_STEP))
+        return result
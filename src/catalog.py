@@ -0,0 +1,103 @@
+import difflib
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from datetime import timedelta
+
+# 运费模板配置 (getBaseSelectData) 的本地缓存目录，每个账号一个文件
+CATALOG_DIR = os.path.join("data", "catalog")
+# 缓存有效期，过期后登录时重新获取；命令行 --refresh-templates 可强制刷新
+CATALOG_TTL = timedelta(hours=6)
+# 模板名字近似匹配的相似度下限 (difflib，0-1)
+SUGGEST_CUTOFF = 0.6
+SUGGEST_LIMIT = 3
+
+
+def normalize_name(name):
+    """
+    用于匹配的模板名字：全角转半角 (NFKC)、去掉所有空白、忽略大小写
+    CSV 中的 "专用模板 "、"模板１" 分别能匹配到 "专用模板"、"模板1"
+    """
+    return "".join(unicodedata.normalize("NFKC", str(name)).split()).casefold()
+
+
+class MouldCatalog:
+    """店铺的运费模板列表，按名字精确匹配，其次按规范化后的名字匹配"""
+
+    def __init__(self, moulds, fetched_at=None):
+        """
+        :param moulds: getBaseSelectData 返回的 mouldList
+        :param fetched_at: 获取时间 (时间戳)，默认为当前时间
+        """
+        self.moulds = moulds
+        self.fetched_at = fetched_at or time.time()
+        self.by_name = {m['mouldName']: m for m in moulds}
+        # 规范化名字 -> 模板列表 (不同模板规范化后同名时无法自动匹配)
+        self.index = {}
+        for m in moulds:
+            self.index.setdefault(normalize_name(m['mouldName']), []).append(m)
+
+    @property
+    def mould_ids(self):
+        return [m['mouldId'] for m in self.moulds]
+
+    def is_fresh(self, ttl=CATALOG_TTL):
+        return time.time() - self.fetched_at < ttl.total_seconds()
+
+    def lookup(self, name):
+        """
+        :return: 名字对应的模板 (dict)，没有或有歧义时返回 None
+        """
+        mould = self.by_name.get(name)
+        if mould is not None:
+            return mould
+        candidates = self.index.get(normalize_name(name), [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def suggest(self, name):
+        """与名字相近的模板名字，用于提示 CSV 中写错的模板名"""
+        keys = difflib.get_close_matches(normalize_name(name), self.index, n=SUGGEST_LIMIT, cutoff=SUGGEST_CUTOFF)
+        return [m['mouldName'] for key in keys for m in self.index[key]]
+
+    def describe_missing(self, name):
+        """模板不存在时的错误信息，附带相近的模板名字"""
+        suggestions = self.suggest(name)
+        message = f"运费模板 '{name}' 不存在于当前店铺配置中"
+        if suggestions:
+            message += f"，是否为: {'、'.join(suggestions)}"
+        return message
+
+
+class CatalogCache:
+    """按账号缓存运费模板配置，开始任务前即可离线校验模板 CSV 中的运费模板名字"""
+
+    def __init__(self, directory=CATALOG_DIR):
+        self.directory = directory
+
+    def path(self, username):
+        name = hashlib.sha256(username.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, username):
+        """
+        :return: MouldCatalog (可能已过期，由调用方判断)；没有缓存时返回 None
+        """
+        try:
+            with open(self.path(username), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("username") != username:
+                return None
+            return MouldCatalog(data["mouldList"], data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, username, catalog):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(username)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"username": username, "fetched_at": catalog.fetched_at, "mouldList": catalog.moulds},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,210 @@
+"""
+命令行入口，不导入 Tkinter，适合在 cron 等无界面环境中运行
+
+    kfz-freight run 运费修改模板.csv --credentials ~/.kfz.json
+    KFZ_USERNAME=账号 KFZ_PASSWORD=密码 kfz-freight resume output/20250101120000
+    kfz-freight merge output/20250101120000
+    kfz-freight multi accounts.json --processes 4
+
+进度以 JSON Lines 输出到 stdout，日志输出到 stderr 与 logs/ 目录；任务全部完成时退出码为 0
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+# 账号密码的环境变量
+USERNAME_ENV = "KFZ_USERNAME"
+PASSWORD_ENV = "KFZ_PASSWORD"
+# 导出格式，与 sinks.OUTPUT_FORMATS 一致 (这里不导入 sinks，保持 --help 等命令启动快)
+FORMAT_CHOICES = ("csv", "jsonl", "sqlite")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="kfz-freight", description="孔网出售中商品运费模板批量修改 (命令行)")
+    parser.add_argument("--workdir", help="工作目录，output/、logs/、data/ 均相对于该目录，默认当前目录")
+    parser.add_argument("--progress", choices=("json", "none"), default="json",
+                        help="进度输出方式：json 为每个进度事件输出一行 JSON 到 stdout")
+    parser.add_argument("--debug", action="store_true", help="记录 DEBUG 日志 (含每个请求的数据)，等同于 KFZ_LOG_LEVEL=DEBUG")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_credentials(sub):
+        sub.add_argument("--credentials", help="账号文件 (JSON: {\"username\": ..., \"password\": ...})，"
+                                               f"未指定时读取环境变量 {USERNAME_ENV} / {PASSWORD_ENV}")
+        sub.add_argument("--username", help="孔网账号，覆盖账号文件与环境变量中的账号")
+        sub.add_argument("--fetch-workers", type=int, default=4, help="获取商品列表的并发线程数")
+        sub.add_argument("--fresh-login", action="store_true", help="不复用保存的登录会话 (data/sessions/)，重新登录")
+        sub.add_argument("--refresh-templates", action="store_true",
+                         help="不使用缓存的运费模板配置 (data/catalog/)，登录后重新获取")
+
+    run = commands.add_parser("run", help="按模板新建任务")
+    run.add_argument("template", help="运费修改模板 CSV (价格下限,价格上限,运费模板名字)")
+    add_credentials(run)
+    run.add_argument("--update-workers", type=int, default=2, help="流水线模式下的批量修改线程数")
+    run.add_argument("--pipeline", action="store_true", help="流水线模式 (边获取边修改，不支持断点续跑)")
+    run.add_argument("--single-pass", action="store_true", help="单次扫描全部商品并在本地按价格分区间")
+    run.add_argument("--mould-filter", action="store_true", help="只获取非目标运费模板的商品")
+    run.add_argument("--no-skip-unchanged", action="store_true", help="已是目标模板的商品也提交修改")
+    run.add_argument("--store", action="store_true", help="先增量同步到本地商品库，再从本地库导出")
+    run.add_argument("--full-sync", action="store_true", help="使用本地商品库时强制完整同步")
+    run.add_argument("--format", choices=FORMAT_CHOICES, default="csv", help="区间导出文件格式")
+    run.add_argument("--no-merge", action="store_true", help="修改结果只记录在 results.tsv，不合并回导出文件")
+    run.add_argument("--verify", action="store_true", help="修改完成后按运费模板复核，只重新提交仍未改好的商品")
+
+    resume = commands.add_parser("resume", help="按输出目录断点续跑")
+    resume.add_argument("run_dir", help="任务输出目录")
+    add_credentials(resume)
+
+    merge = commands.add_parser("merge", help="把结果日志合并回区间导出文件 (不需要登录)")
+    merge.add_argument("run_dir", help="任务输出目录")
+
+    multi = commands.add_parser("multi", help="多个账号同时运行 (每个账号一个进程)")
+    multi.add_argument("accounts", help="账号任务文件 (JSON 列表: username / password / template / options)")
+    multi.add_argument("--processes", type=int, default=4, help="同时运行的账号数")
+    return parser
+
+
+def load_credentials(args):
+    """
+    读取账号密码：账号文件优先，其次环境变量；--username 覆盖账号
+    密码不支持从命令行参数传入 (会出现在进程列表中)
+    :return: (bool, (username, password) / 错误信息)
+    """
+    username, password = os.environ.get(USERNAME_ENV), os.environ.get(PASSWORD_ENV)
+    if args.credentials:
+        try:
+            with open(args.credentials, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            return False, f"读取账号文件失败: {e}"
+        username, password = data.get("username", username), data.get("password", password)
+        if os.name == "posix" and os.stat(args.credentials).st_mode & 0o077:
+            print(f"警告: 账号文件 {args.credentials} 可被其他用户读取，建议 chmod 600", file=sys.stderr)
+    username = args.username or username
+    if not username or not password:
+        return False, f"缺少账号或密码：请使用 --credentials 或设置环境变量 {USERNAME_ENV} / {PASSWORD_ENV}"
+    return True, (username, password)
+
+
+class JsonProgress:
+    """把进度事件与汇总后的总体进度作为一行 JSON 写到 stdout，供 cron 日志或其他程序解析"""
+
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.trackers = {} # 账号 -> ProgressTracker，多账号时各账号分别计算进度
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        with self.lock:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+    def __call__(self, event, account=None):
+        from .progress import ProgressTracker
+        tracker = self.trackers.setdefault(account, ProgressTracker())
+        tracker.apply(event)
+        snapshot = tracker.snapshot()
+        record = {"account": account} if account else {}
+        record.update({
+            "time": round(time.time(), 3),
+            "event": event.kind,
+            "label": event.label,
+            "items": event.items,
+            "total": event.total,
+            "percent": round(snapshot["percent"], 2),
+            "fetched": snapshot["fetched"],
+            "updated": snapshot["updated"],
+            "fetch_rate": round(snapshot["fetch_rate"], 1),
+            "update_rate": round(snapshot["update_rate"], 1),
+            "eta": None if snapshot["eta"] is None else round(snapshot["eta"])
+        })
+        self.write(record)
+
+
+def run_multi(args, progress):
+    """多账号任务：账号文件中的每个账号在独立进程中运行，结束后写入汇总报告"""
+    from .runner import MultiAccountRunner, load_accounts
+
+    ok, jobs = load_accounts(args.accounts)
+    if not ok:
+        print(jobs, file=sys.stderr)
+        return 2
+    if os.name == "posix" and os.stat(args.accounts).st_mode & 0o077:
+        print(f"警告: 账号文件 {args.accounts} 可被其他用户读取，建议 chmod 600", file=sys.stderr)
+    runner = MultiAccountRunner(jobs, max_processes=args.processes,
+                                progress_callback=(lambda account, event: progress(event, account)) if progress else None)
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop())
+    results = runner.run()
+    if progress:
+        progress.write({"time": round(time.time(), 3), "event": "finished", "ok": all(r["ok"] for r in results),
+                        "run_dir": runner.batch_dir, "accounts": results})
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.workdir:
+        os.chdir(args.workdir)
+
+    credentials = None
+    if args.command not in ("merge", "multi"):
+        ok, credentials = load_credentials(args)
+        if not ok:
+            print(credentials, file=sys.stderr)
+            return 2
+
+    # stdout 留给 JSON 进度，日志写到 stderr；业务逻辑 (requests 等) 在参数校验通过后才导入
+    from .utils import LOG_LEVEL_ENV, setup_logger
+    if args.debug:
+        # 写入环境变量，多账号模式的子进程同样生效
+        os.environ[LOG_LEVEL_ENV] = "DEBUG"
+    setup_logger(stream=sys.stderr)
+    progress = JsonProgress() if args.progress == "json" else None
+    if args.command == "multi":
+        return run_multi(args, progress)
+
+    from .logic import FreightBatchProcessor
+    processor = FreightBatchProcessor(progress_callback=progress, fetch_workers=getattr(args, "fetch_workers", 4),
+                                      reuse_session=not getattr(args, "fresh_login", False),
+                                      refresh_catalog=getattr(args, "refresh_templates", False))
+    if args.command == "run":
+        processor.update_workers = max(1, args.update_workers)
+        processor.pipeline = args.pipeline
+        processor.single_pass = args.single_pass
+        processor.mould_filter = args.mould_filter
+        processor.skip_unchanged = not args.no_skip_unchanged
+        processor.use_store = args.store
+        processor.full_sync = args.full_sync
+        processor.output_format = args.format
+        processor.merge_results = not args.no_merge
+        processor.verify = args.verify
+
+    # SIGTERM / Ctrl+C 时停止任务 (已落盘的进度可断点续跑)，而不是直接中断
+    # (信号处理函数中不写日志，避免与被打断的日志调用争用锁；停止后会记录 "任务已停止")
+    def request_stop(signum, frame):
+        processor.stop()
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, request_stop)
+
+    if args.command == "run":
+        ok = processor.run(args.template, *credentials)
+    elif args.command == "resume":
+        ok = processor.resume(args.run_dir, *credentials)
+    else:
+        ok = processor.merge(args.run_dir)
+
+    if progress:
+        progress.write({"time": round(time.time(), 3), "event": "finished", "ok": bool(ok),
+                        "stopped": processor.stop_requested, "run_dir": processor.run_dir,
+                        "summary": processor.summary})
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
+import queue
 import threading
 import sys
 import os
-from .logic import FreightBatchProcessor
+from collections import deque
+from .sinks import OUTPUT_FORMATS
+from .progress import ProgressTracker
 from .utils import logger, open_directory
 
+# 日志队列的刷新间隔 (毫秒)，每次把队列中的日志一次性插入界面
+LOG_TICK_MS = 100
+# 单次刷新最多处理的日志条数，避免日志暴增时一次刷新卡住界面
+LOG_DRAIN_MAX = 5000
+# 日志框中最多保留的行数，超出后删除最早的行
+LOG_VIEW_LINES = 2000
+# 内存中保留的最近日志条数；WARNING/ERROR 另外单独保留，按级别筛选时可找回更早的错误
+LOG_HISTORY = 20000
+# 日志级别筛选项 -> 显示的级别
+LOG_FILTERS = {
+    "全部": ("INFO", "WARNING", "ERROR"),
+    "警告及错误": ("WARNING", "ERROR"),
+    "仅错误": ("ERROR",)
+}
+
 class TextRedirector(object):
     def __init__(self, widget, tag="stdout"):
         self.widget = widget
@@ -33,10 +51,28 @@ class MainWindow:
         self.csv_path = tk.StringVar()
         self.username = tk.StringVar()
         self.password = tk.StringVar()
+        self.pipeline = tk.BooleanVar(value=False)
+        self.single_pass = tk.BooleanVar(value=False)
+        self.mould_filter = tk.BooleanVar(value=False)
+        self.use_store = tk.BooleanVar(value=False)
+        self.verify = tk.BooleanVar(value=False)
+        self.output_format = tk.StringVar(value="csv")
+        self.log_filter = tk.StringVar(value="全部")
         self.is_running = False
-        self.processor = FreightBatchProcessor(self.log_to_ui)
+        # 工作线程只往队列里放日志，由界面线程定时批量取出
+        self.log_queue = queue.Queue()
+        self.log_history = deque(maxlen=LOG_HISTORY)
+        self.log_problems = deque(maxlen=LOG_HISTORY)
+        # 进度事件同样经队列交给界面线程
+        self.progress_queue = queue.Queue()
+        self.progress = ProgressTracker()
+        # 业务逻辑依赖 requests，导入较慢：窗口显示后在后台线程预先导入，首次开始任务时再创建
+        self.processor = None
+        self.runner = None # 多账号任务运行期间的 MultiAccountRunner
         
         self.setup_ui()
+        self.root.after(LOG_TICK_MS, self._drain_log_queue)
+        self.root.after(LOG_TICK_MS, lambda: threading.Thread(target=self._preload, daemon=True).start())
         
         # 初始日志
         logger.info("程序启动。请选择模板文件并输入账号信息。")
@@ -57,6 +93,7 @@ class MainWindow:
         style.configure("TLabel", background=bg_color, foreground=fg_color)
         style.configure("TLabelframe", background=bg_color, foreground=fg_color)
         style.configure("TLabelframe.Label", background=bg_color, foreground=fg_color)
+        style.configure("TCheckbutton", background=bg_color, foreground=fg_color)
         style.configure("TEntry", fieldbackground="white", foreground="black")
         style.configure("TButton", background="#e1e1e1", foreground="black", padding=5)
         style.map("TButton", background=[("active", "#cccccc")])
@@ -81,12 +118,28 @@ class MainWindow:
         ttk.Entry(frame_account, textvariable=self.username, width=20).pack(side="left", padx=5)
         ttk.Label(frame_account, text="密码:").pack(side="left")
         ttk.Entry(frame_account, textvariable=self.password, show="*", width=20).pack(side="left", padx=5)
+
+        # 运行选项
+        frame_opts = ttk.Frame(frame_top)
+        frame_opts.pack(fill="x", pady=5)
+        ttk.Checkbutton(frame_opts, text="流水线模式(边获取边修改)", variable=self.pipeline).pack(side="left")
+        ttk.Checkbutton(frame_opts, text="单次扫描", variable=self.single_pass).pack(side="left", padx=10)
+        ttk.Checkbutton(frame_opts, text="只获取非目标模板的商品", variable=self.mould_filter).pack(side="left")
+        ttk.Checkbutton(frame_opts, text="本地商品库(增量同步)", variable=self.use_store).pack(side="left", padx=10)
+        ttk.Checkbutton(frame_opts, text="修改后复核", variable=self.verify).pack(side="left", padx=(0, 10))
+        ttk.Label(frame_opts, text="导出格式:").pack(side="left")
+        ttk.Combobox(frame_opts, textvariable=self.output_format, values=list(OUTPUT_FORMATS),
+                     state="readonly", width=8).pack(side="left", padx=5)
         
         # 按钮区
         frame_btn = ttk.Frame(frame_top)
         frame_btn.pack(fill="x", pady=10)
         self.btn_start = ttk.Button(frame_btn, text="开始执行", command=self.start_task)
         self.btn_start.pack(side="left", padx=5)
+        self.btn_resume = ttk.Button(frame_btn, text="断点续跑...", command=self.resume_task)
+        self.btn_resume.pack(side="left", padx=5)
+        self.btn_multi = ttk.Button(frame_btn, text="多账号...", command=self.multi_task)
+        self.btn_multi.pack(side="left", padx=5)
         self.btn_stop = ttk.Button(frame_btn, text="停止", command=self.stop_task, state="disabled")
         self.btn_stop.pack(side="left", padx=5)
         
@@ -97,9 +150,26 @@ class MainWindow:
         self.btn_open_logs = ttk.Button(frame_btn, text="打开日志目录", command=self.open_logs_dir)
         self.btn_open_logs.pack(side="left", padx=5)
         
+        # 进度区
+        frame_progress = ttk.Frame(self.root, padding="10 0")
+        frame_progress.pack(fill="x", padx=10)
+        self.progress_bar = ttk.Progressbar(frame_progress, maximum=100)
+        self.progress_bar.pack(fill="x")
+        self.progress_text = tk.StringVar(value="等待开始")
+        ttk.Label(frame_progress, textvariable=self.progress_text).pack(anchor="w")
+
         # 日志区
         frame_log = ttk.LabelFrame(self.root, text="运行日志", padding="10")
         frame_log.pack(fill="both", expand=True, padx=10, pady=5)
+
+        frame_filter = ttk.Frame(frame_log)
+        frame_filter.pack(fill="x", pady=(0, 5))
+        ttk.Label(frame_filter, text="显示:").pack(side="left")
+        self.combo_filter = combo_filter = ttk.Combobox(frame_filter, textvariable=self.log_filter, values=list(LOG_FILTERS),
+                                    state="readonly", width=10)
+        combo_filter.pack(side="left", padx=5)
+        combo_filter.bind("<<ComboboxSelected>>", lambda e: self._render_log())
+        ttk.Label(frame_filter, text=f"(界面只显示最近 {LOG_VIEW_LINES} 行，完整日志见日志目录)").pack(side="left")
         
         self.txt_log = scrolledtext.ScrolledText(frame_log, state='disabled', bg="white", fg="black", insertbackground="black")
         self.txt_log.pack(fill="both", expand=True)
@@ -110,18 +180,116 @@ class MainWindow:
         self.txt_log.tag_config("ERROR", foreground="red")
 
     def log_to_ui(self, message, level="INFO"):
-        self.root.after(0, self._append_log, message, level)
+        """可在任意线程调用，日志先进入队列，由 _drain_log_queue 批量显示"""
+        self.log_queue.put((level, message))
+
+    def _drain_log_queue(self):
+        """定时取出队列中的日志，按当前筛选条件一次性插入日志框"""
+        levels = LOG_FILTERS[self.log_filter.get()]
+        records = []
+        try:
+            while len(records) < LOG_DRAIN_MAX:
+                records.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        for record in records:
+            self.log_history.append(record)
+            if record[0] != "INFO":
+                self.log_problems.append(record)
+        self._append_log([r for r in records if r[0] in levels])
+        self._update_progress()
+        self.root.after(LOG_TICK_MS, self._drain_log_queue)
 
-    def _append_log(self, message, level="INFO"):
+    def _update_progress(self):
+        """应用队列中的进度事件，刷新进度条、速度与预计剩余时间"""
+        changed = False
+        try:
+            while True:
+                self.progress.apply(self.progress_queue.get_nowait())
+                changed = True
+        except queue.Empty:
+            pass
+        if (not changed and not self.is_running) or self.runner is not None:
+            # 多账号任务不显示合并进度，保留运行提示
+            return
+
+        snap = self.progress.snapshot()
+        self.progress_bar["value"] = snap["percent"]
+        eta = "--:--:--"
+        if snap["eta"] is not None:
+            seconds = int(snap["eta"])
+            eta = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        self.progress_text.set(
+            f"{snap['percent']:.1f}%  |  已获取 {snap['fetched']} 条 ({snap['fetch_rate']:.0f} 条/秒)  |  "
+            f"已修改 {snap['updated']} 条 ({snap['update_rate']:.0f} 条/秒)  |  预计剩余 {eta}  |  {snap['current']}")
+
+    def reset_progress(self):
+        try:
+            while True:
+                self.progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.progress = ProgressTracker()
+        self.progress_bar["value"] = 0
+        self.progress_text.set("等待开始")
+
+    def _append_log(self, records):
+        """一次插入多条日志，并删除超出 LOG_VIEW_LINES 的最早行"""
+        records = records[-LOG_VIEW_LINES:]
+        if not records:
+            return
+        chunks = []
+        for level, message in records:
+            chunks.extend((message + "\n", (level,)))
         self.txt_log.configure(state="normal")
-        self.txt_log.insert("end", message + "\n", (level,))
+        self.txt_log.insert("end", *chunks)
+        lines = int(self.txt_log.index("end-1c").split(".")[0]) - 1
+        if lines > LOG_VIEW_LINES:
+            self.txt_log.delete("1.0", f"{lines - LOG_VIEW_LINES + 1}.0")
         self.txt_log.see("end")
         self.txt_log.configure(state="disabled")
 
+    def _render_log(self):
+        """切换筛选条件后按内存中的日志重新显示；筛选警告/错误时可找回已被挤出最近日志的记录"""
+        levels = LOG_FILTERS[self.log_filter.get()]
+        source = self.log_history if "INFO" in levels else self.log_problems
+        records = deque((r for r in source if r[0] in levels), maxlen=LOG_VIEW_LINES)
+        self.txt_log.configure(state="normal")
+        self.txt_log.delete("1.0", "end")
+        self.txt_log.configure(state="disabled")
+        self._append_log(list(records))
+
+    def clear_log(self):
+        self.log_history.clear()
+        self.log_problems.clear()
+        self.txt_log.configure(state="normal")
+        self.txt_log.delete("1.0", "end")
+        self.txt_log.configure(state="disabled")
+
+    def _preload(self):
+        from . import logic  # noqa: F401
+
+    def get_processor(self):
+        if self.processor is None:
+            from .logic import FreightBatchProcessor
+            self.processor = FreightBatchProcessor(self.log_to_ui, progress_callback=self.progress_queue.put)
+        return self.processor
+
     def browse_file(self):
         filename = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")])
         if filename:
             self.csv_path.set(filename)
+            self.check_template(filename)
+
+    def check_template(self, path):
+        """选择文件后立即校验模板格式；已输入账号时用缓存的运费模板配置离线校验模板名字"""
+        processor = self.get_processor()
+        valid, rows = processor.validate_template_csv(path)
+        if valid and self.username.get():
+            valid, rows = processor.check_template_moulds(rows, self.username.get())
+        if not valid:
+            messagebox.showwarning("模板校验失败", rows)
 
     def open_output_dir(self):
         success, msg = open_directory("output")
@@ -141,7 +309,11 @@ class MainWindow:
         # 遍历所有子组件寻找 Entry 和 Button
         def toggle_widgets(container):
             for child in container.winfo_children():
-                if isinstance(child, (ttk.Entry, ttk.Button)):
+                if isinstance(child, ttk.Combobox):
+                    # 下拉框恢复为只读而不是可编辑；日志筛选运行期间也可用
+                    if child is not self.combo_filter:
+                        child.config(state="readonly" if state == "normal" else state)
+                elif isinstance(child, (ttk.Entry, ttk.Button, ttk.Checkbutton)):
                     if child not in (self.btn_stop, self.btn_open_output, self.btn_open_logs):
                         child.config(state=state)
                 elif child.winfo_children():
@@ -161,25 +333,96 @@ class MainWindow:
             messagebox.showwarning("提示", "请输入账号和密码")
             return
             
+        processor = self.get_processor()
+        processor.pipeline = self.pipeline.get()
+        processor.single_pass = self.single_pass.get()
+        processor.mould_filter = self.mould_filter.get()
+        processor.use_store = self.use_store.get()
+        processor.verify = self.verify.get()
+        processor.output_format = self.output_format.get()
         self.is_running = True
         self.set_ui_state("disabled")
         self.btn_stop.config(state="normal")
-        self.txt_log.delete(1.0, "end") # 清空日志
+        self.clear_log()
+        self.reset_progress()
         
         # 在新线程运行
         thread = threading.Thread(target=self.run_thread, args=(csv_file, user, pwd))
         thread.daemon = True
         thread.start()
 
+    def resume_task(self):
+        user = self.username.get()
+        pwd = self.password.get()
+        if not user or not pwd:
+            messagebox.showwarning("提示", "请输入账号和密码")
+            return
+
+        run_dir = filedialog.askdirectory(initialdir="output", title="选择要续跑的任务输出目录")
+        if not run_dir:
+            return
+
+        self.get_processor()
+        self.is_running = True
+        self.set_ui_state("disabled")
+        self.btn_stop.config(state="normal")
+        self.clear_log()
+        self.reset_progress()
+
+        thread = threading.Thread(target=self.run_thread, args=(None, user, pwd, run_dir))
+        thread.daemon = True
+        thread.start()
+
+    def multi_task(self):
+        """选择多账号任务文件，各账号在独立进程中同时运行"""
+        path = filedialog.askopenfilename(title="选择多账号任务文件",
+                                          filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")])
+        if not path:
+            return
+        from .runner import MultiAccountRunner, load_accounts
+        ok, jobs = load_accounts(path)
+        if not ok:
+            messagebox.showerror("错误", jobs)
+            return
+
+        self.runner = MultiAccountRunner(jobs, log_callback=self.log_to_ui)
+        self.is_running = True
+        self.set_ui_state("disabled")
+        self.btn_stop.config(state="normal")
+        self.clear_log()
+        self.reset_progress()
+        self.progress_text.set(f"多账号任务运行中 ({len(jobs)} 个账号)，各账号进度见日志")
+
+        thread = threading.Thread(target=self.run_multi_thread)
+        thread.daemon = True
+        thread.start()
+
+    def run_multi_thread(self):
+        try:
+            self.runner.run()
+        except Exception as e:
+            self.log_to_ui(f"发生未捕获异常: {e}", "ERROR")
+            logger.exception("Multi-account run error")
+        finally:
+            self.is_running = False
+            self.runner = None
+            self.root.after(0, self.task_finished)
+
     def stop_task(self):
         if self.is_running:
-            self.processor.stop()
+            if self.runner:
+                self.runner.stop()
+            else:
+                self.processor.stop()
             self.log_to_ui("正在停止任务...", "WARNING")
             self.btn_stop.config(state="disabled")
 
-    def run_thread(self, csv_file, user, pwd):
+    def run_thread(self, csv_file, user, pwd, resume_dir=None):
         try:
-            self.processor.run(csv_file, user, pwd)
+            if resume_dir:
+                self.processor.resume(resume_dir, user, pwd)
+            else:
+                self.processor.run(csv_file, user, pwd)
         except Exception as e:
             self.log_to_ui(f"发生未捕获异常: {e}", "ERROR")
             logger.exception("Run loop error")
@@ -0,0 +1,87 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+# 每个容器覆盖 2^16 个连续的 itemId；元素不超过 ARRAY_MAX 个时用有序 array('H')，超过后转为 8KB 位图
+CONTAINER_BITS = 16
+LOW_MASK = (1 << CONTAINER_BITS) - 1
+ARRAY_MAX = 4096
+
+
+class ItemIdSet:
+    """
+    紧凑的 itemId 集合 (简化的 Roaring Bitmap)：按 ID 高位分桶，稀疏的桶每个 ID 占 2 字节，
+    稠密的桶每个 ID 占 1 位，不为每个 ID 创建 Python 对象，百万级 ID 只占几 MB
+    """
+
+    def __init__(self):
+        self.containers = {}
+        self.size = 0
+
+    def add(self, item_id):
+        """
+        :return: 是否为新加入的 ID
+        """
+        item_id = int(item_id)
+        high, low = item_id >> CONTAINER_BITS, item_id & LOW_MASK
+        container = self.containers.get(high)
+        if container is None:
+            self.containers[high] = array('H', [low])
+        elif isinstance(container, bytearray):
+            byte, bit = low >> 3, 1 << (low & 7)
+            if container[byte] & bit:
+                return False
+            container[byte] |= bit
+        else:
+            pos = bisect_left(container, low)
+            if pos < len(container) and container[pos] == low:
+                return False
+            if len(container) < ARRAY_MAX:
+                container.insert(pos, low)
+            else:
+                bitmap = bytearray(1 << (CONTAINER_BITS - 3))
+                for value in container:
+                    bitmap[value >> 3] |= 1 << (value & 7)
+                bitmap[low >> 3] |= 1 << (low & 7)
+                self.containers[high] = bitmap
+        self.size += 1
+        return True
+
+    def __contains__(self, item_id):
+        item_id = int(item_id)
+        container = self.containers.get(item_id >> CONTAINER_BITS)
+        if container is None:
+            return False
+        low = item_id & LOW_MASK
+        if isinstance(container, bytearray):
+            return bool(container[low >> 3] & (1 << (low & 7)))
+        pos = bisect_left(container, low)
+        return pos < len(container) and container[pos] == low
+
+    def __len__(self):
+        return self.size
+
+
+class ItemClaims:
+    """
+    记录每个商品最先出现在哪个区间，用于发现同一商品落入多个区间
+    按区间顺序 claim 时，商品归属于序号最小的区间
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = ItemIdSet()
+        self.bands = {} # 区间序号 -> 归属该区间的 ItemIdSet
+
+    def claim(self, band, item_id):
+        """
+        :return: 已拥有该商品的其他区间序号；商品首次出现或之前只出现在本区间时返回 None
+        """
+        with self.lock:
+            if self.seen.add(item_id):
+                self.bands.setdefault(band, ItemIdSet()).add(item_id)
+                return None
+            for owner, ids in self.bands.items():
+                if item_id in ids:
+                    return owner if owner != band else None
+            return None
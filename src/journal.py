@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+from .idset import ItemIdSet
+
+JOURNAL_FILENAME = "journal.jsonl"
+# 批量修改结果日志，每行: 区间序号\titemId\t结果
+RESULTS_FILENAME = "results.tsv"
+# 结果日志中用集合保存的结果，其他结果 (失败原因、重复) 逐条保存
+SET_RESULTS = ('成功', '无需修改')
+
+
+class JournalState:
+    """
+    从进度日志回放出的断点状态
+    - run: 任务参数 (模板行、运行选项)
+    - units: 获取单元 -> {"page": 已完成的最后一页, "done": 是否获取完毕}
+    - sizes: 区间序号 -> 区间 CSV 已落盘的字节数
+    - counts: 区间序号 -> 已获取条数
+    - batches: 区间序号 -> {"rows": 已处理行数, "last": 最后一个 itemId}
+    - results_size: 结果日志已记录的字节数 (批量修改或复核的批次)，续跑时截断其后写了一半的结果
+    - splits: 区间序号 -> 拆分出的子区间 [[价格下限, 价格上限], ...]
+    - files_done: 结果已合并回 CSV 的区间序号
+    - summary: 已完成批次的 成功/失败/无需修改/跨区间重复 计数
+    """
+
+    def __init__(self):
+        self.run = None
+        self.units = {}
+        self.sizes = {}
+        self.counts = {}
+        self.batches = {}
+        self.splits = {}
+        self.results_size = 0
+        self.files_done = set()
+        self.summary = {"success": 0, "fail": 0, "skipped": 0, "duplicate": 0}
+        self.done = False
+
+    def apply(self, record):
+        kind = record.get("type")
+        if kind == "run":
+            self.run = record
+        elif kind == "page":
+            unit = self.units.setdefault(record["unit"], {"page": 0, "done": False})
+            unit["page"] = record["page"]
+            for index, size in record.get("sizes", {}).items():
+                self.sizes[int(index)] = size
+            for index, count in record.get("counts", {}).items():
+                self.counts[int(index)] = self.counts.get(int(index), 0) + count
+        elif kind == "unit":
+            self.units.setdefault(record["unit"], {"page": 0, "done": False})["done"] = True
+        elif kind == "batch":
+            index = record["job"]
+            progress = self.batches.setdefault(index, {"rows": 0, "last": None})
+            progress["rows"] = record["rows"]
+            progress["last"] = record.get("last")
+            self.results_size = record.get("results", self.results_size)
+            for key in self.summary:
+                self.summary[key] += record.get(key, 0)
+        elif kind == "verify":
+            self.results_size = record["results"]
+        elif kind == "split":
+            self.splits[record["job"]] = [tuple(r) for r in record["ranges"]]
+        elif kind == "file_done":
+            self.files_done.add(record["job"])
+        elif kind == "done":
+            self.done = True
+
+
+class RunJournal:
+    """
+    追加写入的进度日志 (JSON Lines)，位于任务输出目录下
+    每条记录写入后立即 flush + fsync，崩溃后最多丢失正在写入的最后一行
+    """
+
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, JOURNAL_FILENAME)
+        self.lock = threading.Lock()
+        self.file = None
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def load(self):
+        """
+        回放日志得到断点状态，末尾写了一半的记录会被忽略
+        :return: JournalState，日志不存在时返回 None
+        """
+        if not os.path.exists(self.path):
+            return None
+        state = JournalState()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                state.apply(record)
+        return state
+
+
+class ResultIndex:
+    """
+    按区间汇总的修改结果，"成功" 与 "无需修改" 用 ItemIdSet 保存，只有失败原因、重复等结果逐条保存
+    """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def add(self, job, item_id, result):
+        """同一商品有多条结果时以最后一条为准 (复核重新修改的结果追加在批量修改之后)"""
+        sets, others = self.jobs.setdefault(job, ({r: ItemIdSet() for r in SET_RESULTS}, {}))
+        if result in sets:
+            sets[result].add(item_id)
+            others.pop(int(item_id), None)
+        else:
+            others[int(item_id)] = result
+
+    def has_job(self, job):
+        """该区间是否有任何结果"""
+        return job in self.jobs
+
+    def get(self, job, item_id):
+        """:return: 结果，未处理的商品返回空字符串"""
+        if job not in self.jobs:
+            return ''
+        sets, others = self.jobs[job]
+        item_id = int(item_id)
+        if item_id in others:
+            return others[item_id]
+        for result, ids in sets.items():
+            if item_id in ids:
+                return result
+        return ''
+
+
+class ResultJournal:
+    """
+    批量修改结果日志 (制表符分隔)，位于任务输出目录下
+    每个批次的结果追加写入后立即 flush + fsync，不必等整个区间处理完；最后再合并回区间 CSV
+    """
+
+    def __init__(self, run_dir):
+        self.path = os.path.join(run_dir, RESULTS_FILENAME)
+        self.lock = threading.Lock()
+        self.file = None
+
+    def append(self, records):
+        """
+        :param records: [(区间序号, itemId, 结果), ...]
+        :return: 写入后的文件字节数，记录到进度日志用于续跑时截断
+        """
+        lines = "".join(f"{job}\t{item_id}\t{' '.join(str(result).split())}\n" for job, item_id, result in records)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8', newline='')
+            self.file.write(lines)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            return os.fstat(self.file.fileno()).st_size
+
+    def truncate(self, size):
+        """丢弃最后一个断点之后写入的结果 (续跑时这些商品会重新处理)"""
+        self.close()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def load(self):
+        """:return: ResultIndex，日志不存在时为空"""
+        index = ResultIndex()
+        if not os.path.exists(self.path):
+            return index
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t", 2)
+                if len(parts) == 3:
+                    index.add(int(parts[0]), parts[1], parts[2])
+        return index
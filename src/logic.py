@@ -1,14 +1,124 @@
 import csv
+import math
 import os
+import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, closing, nullcontext
 from datetime import datetime
-from .api import KfzClient
+from itertools import islice
+from .api import BATCH_ERROR_CODES, KfzClient
+from .bands import PriceBandIndex, from_cents, to_cents
+from .catalog import CatalogCache, MouldCatalog
+from .idset import ItemClaims
+from .journal import RESULTS_FILENAME, JournalState, ResultIndex, ResultJournal, RunJournal
 from .login import LoginManager
+from .metrics import RunMetrics
+from .progress import BATCH_UPDATED, PAGE_FETCHED, PLANNED, RANGE_STARTED, UPDATE_STARTED, ProgressEvent
+from .ratelimit import get_rate_limiter
+from .records import ItemRecord
+from .sinks import get_sink_class
+from .store import FULL_SYNC_INTERVAL, ItemStore, sync_window
 from .utils import logger
 
+# 批量修改接口单次最多提交的商品数
+BATCH_SIZE = 200
+# 商品列表接口每页的商品数
+PAGE_SIZE = 200
+# 一页商品获取失败时的重试次数，每次重试前由限速器按连续失败次数退避
+PAGE_RETRIES = 3
+# 单个区间 (或子区间) 最多翻到的页数，商品更多的区间按价格二分拆成子区间并发获取，避免深分页
+MAX_PAGE_DEPTH = 50
+SPLIT_THRESHOLD = MAX_PAGE_DEPTH * PAGE_SIZE
+# 已是目标运费模板、跳过修改的商品在 result 列的标记
+UNCHANGED_RESULT = '无需修改'
+# 同一商品出现在多个区间时，未被采用的区间中 result 列的标记 (后接采用的区间)
+DUPLICATE_RESULT = '重复: 已按其他区间处理'
+# 修改失败的商品在 result 列的标记 (后接失败原因)
+FAILED_RESULT = '失败'
+# 复核重新提交后仍使用其他运费模板的商品在 result 列的标记
+STILL_WRONG_RESULT = '失败: 复核后仍使用其他运费模板'
+# 结果汇总的计数项：成功 / 失败 / 无需修改 / 跨区间重复
+RESULT_KEYS = ("success", "fail", "skipped", "duplicate")
+# 结果.txt 中最多列出的重复商品明细条数
+MAX_CONFLICT_LINES = 50
+# 任务未完成时日志中最多列出的未完成单元数
+MAX_INCOMPLETE_LINES = 10
+# 批量修改时单个商品的最多尝试次数 (整批失败时的对半拆分不计入)
+MAX_ATTEMPTS = 2
+# 批量修改因网络错误、超时、HTTP 错误失败时每批整批重试的次数
+TRANSPORT_RETRIES = 3
+# 每批因整批报错对半拆分时最多额外请求的次数 (分散在批次中的 k 个问题商品约需 2k*log2(200/k) 次，96 次约可定位 8 个)
+MAX_SPLIT_CALLS = 96
+# 从本地库导出时每次写入的行数
+EXPORT_CHUNK = 2000
+# 性能指标文件，与 结果.txt 放在同一目录
+METRICS_FILENAME = "metrics.json"
+
+
+def job_filename(row, extension=".csv"):
+    """模板行对应的区间导出文件名"""
+    return f"{row['价格下限']}-{row['价格上限']}>{row['运费模板名字']}{extension}"
+
+
 class FreightBatchProcessor:
-    def __init__(self, log_callback=None):
+    def __init__(self, log_callback=None, fetch_workers=4, pipeline=False, update_workers=2,
+                 single_pass=False, skip_unchanged=True, mould_filter=False, use_store=False, full_sync=False,
+                 progress_callback=None, merge_results=True, output_format="csv", output_root="output",
+                 reuse_session=True, refresh_catalog=False, verify=False):
+        """
+        :param log_callback: 日志回调 (message, level)
+        :param progress_callback: 进度回调 (ProgressEvent)，可能在获取/修改线程中调用
+        :param fetch_workers: 获取商品列表时的并发线程数 (第 1 页之后的分页并发获取)
+        :param pipeline: 是否使用流水线模式 (边获取边修改)
+        :param update_workers: 流水线模式下的批量修改线程数
+        :param single_pass: 是否单次扫描全部商品并在本地按价格分区间
+        :param skip_unchanged: 已是目标运费模板的商品不提交修改，结果标记为 "无需修改"
+        :param mould_filter: 按区间获取时用 shippingMould 只拉取非目标模板的商品 (单次扫描模式下不生效)
+        :param use_store: 先把商品增量同步到本地 SQLite 库，再按价格区间从本地库导出 (不走流水线模式)
+        :param full_sync: 使用本地库时强制完整同步
+        :param merge_results: 批量修改完成后把结果日志合并回区间 CSV 的 result 列；
+            关闭时结果只保留在 results.tsv，可稍后调用 merge 合并
+        :param output_format: 区间导出文件格式，csv / jsonl / sqlite (见 sinks.OUTPUT_FORMATS)
+        :param output_root: 任务输出目录的上级目录，每次 run 在其下按开始时间创建目录
+        :param reuse_session: 复用上次登录保存的会话 (data/sessions/)，失效时才重新登录
+        :param refresh_catalog: 忽略本地缓存的运费模板配置 (data/catalog/)，登录后重新获取
+        :param verify: 批量修改完成后按 shippingMould 查询各区间仍使用其他运费模板的商品，只重新提交这些商品
+        """
         self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.fetch_workers = max(1, int(fetch_workers))
+        self.pipeline = pipeline
+        self.update_workers = max(1, int(update_workers))
+        self.single_pass = single_pass
+        self.skip_unchanged = skip_unchanged
+        self.mould_filter = mould_filter
+        self.use_store = use_store
+        self.full_sync = full_sync
+        self.merge_results = merge_results
+        self.output_format = output_format
+        self.output_root = output_root
+        self.reuse_session = reuse_session
+        self.refresh_catalog = refresh_catalog
+        self.verify = verify
+        self.catalog_cache = CatalogCache()
+        self.sink_class = get_sink_class(output_format)
+        self.store = None
+        self.account = None
+        self.band_index = None
+        self.mould_ids = []
+        self.journal = None
+        self.results = None
+        self.run_dir = None # 当前 (最近一次) 任务的输出目录
+        self.summary = {} # 当前任务的 成功/失败/无需修改/跨区间重复 计数
+        self.conflicts = [] # 跨区间重复的商品 [(itemId, 采用的区间序号, 跳过的区间序号)]
+        self.verification = None # 复核结果 (见 _verify_jobs)，未开启复核时为 None
+        self.incomplete = [] # 未完成的获取单元 / 修改失败的文件，不为空时任务不标记为完成
+        self.metrics = RunMetrics()
+        # 多个修改线程共用汇总计数与 CSV writer 时加锁
+        self._result_lock = threading.Lock()
         self.login_manager = LoginManager()
         self.api = None
         self.stop_requested = False
@@ -24,6 +134,11 @@ class FreightBatchProcessor:
         if self.log_callback:
             self.log_callback(message, level)
 
+    def emit(self, kind, **data):
+        """发出进度事件"""
+        if self.progress_callback:
+            self.progress_callback(ProgressEvent(kind, **data))
+
     def stop(self):
         self.stop_requested = True
 
@@ -31,6 +146,7 @@ class FreightBatchProcessor:
         """
         校验模板 CSV 格式
         格式: | 价格下限 | 价格上限 | 运费模板名字 |
+        价格区间不能重叠，区间之间的空档会以 WARNING 提示
         """
         try:
             with open(file_path, 'r', encoding='utf-8-sig') as f:
@@ -44,184 +160,329 @@ class FreightBatchProcessor:
                 rows = list(reader)
                 if not rows:
                     return False, "文件为空"
-                return True, rows
         except Exception as e:
             return False, f"读取文件失败: {e}"
 
+        # 区间不允许重叠；存在未覆盖的价格段时仅提示
+        try:
+            band_index = PriceBandIndex(rows)
+        except ValueError as e:
+            return False, str(e)
+        for low, high in band_index.gaps():
+            self.log(f"提示: 价格 {low} - {high} 不在任何区间内，这部分商品不会被修改", "WARNING")
+        return True, rows
+
+    def check_template_moulds(self, rows, username):
+        """
+        用本地缓存的运费模板配置离线校验模板中的运费模板名字，不需要登录
+        缓存未过期且名字与已有模板相近 (多半是写错了) 时校验失败；
+        完全找不到相近模板的名字可能是新建的模板，登录后重新获取配置再校验
+        :return: (bool, 错误信息)
+        """
+        catalog = self.catalog_cache.load(username)
+        if catalog is None or self.refresh_catalog:
+            return True, None
+        errors = []
+        for row in rows:
+            name = row['运费模板名字']
+            mould = catalog.lookup(name)
+            if mould is not None:
+                if mould['mouldName'] != name:
+                    self.log(f"提示: 运费模板 '{name}' 按 '{mould['mouldName']}' 匹配")
+            elif catalog.is_fresh() and catalog.suggest(name):
+                errors.append(catalog.describe_missing(name))
+            else:
+                self.log(f"运费模板缓存中没有 '{name}'，登录后将重新获取运费模板配置", "WARNING")
+        if errors:
+            return False, "；".join(errors)
+        return True, None
+
+    def _load_catalog(self, username, template_data):
+        """
+        运费模板配置：缓存未过期且包含模板中的所有名字时直接使用，否则请求接口并更新缓存
+        :return: MouldCatalog，获取失败时返回 None
+        """
+        catalog = None if self.refresh_catalog else self.catalog_cache.load(username)
+        if catalog is not None and catalog.is_fresh() and \
+                all(catalog.lookup(row['运费模板名字']) for row in template_data):
+            self.log("使用缓存的运费模板配置")
+            return catalog
+        success, config = self.api.get_base_select_data()
+        if not success:
+            self.log(f"获取运费模板配置失败: {config}", "ERROR")
+            return None
+        catalog = MouldCatalog(config.get("mouldList", []))
+        try:
+            self.catalog_cache.save(username, catalog)
+        except OSError as e:
+            logger.warning("保存运费模板缓存失败: %s", e)
+        return catalog
+
     def run(self, template_path, username, password):
+        """
+        新建任务：在 output_root 下按开始时间创建输出目录，获取并批量修改
+        :return: 任务是否全部完成；失败或停止时为 False，输出目录见 self.run_dir
+        """
         self.stop_requested = False
         start_time = datetime.now()
         
         # 确保 output 目录存在
-        if not os.path.exists("output"):
-            os.makedirs("output")
+        if not os.path.exists(self.output_root):
+            os.makedirs(self.output_root)
             
-        timestamp_dir = os.path.join("output", start_time.strftime('%Y%m%d%H%M%S'))
+        timestamp_dir = os.path.join(self.output_root, start_time.strftime('%Y%m%d%H%M%S'))
         os.makedirs(timestamp_dir, exist_ok=True)
         
         self.log(f"任务开始，账号: {username}")
         self.log(f"输出目录: {timestamp_dir}")
+        self.run_dir = timestamp_dir
 
-        # 1. 校验模板
+        # 1. 校验模板 (运费模板名字先用本地缓存校验，写错时不必等到登录之后)
         valid, template_data = self.validate_template_csv(template_path)
         if not valid:
             self.log(f"模板校验失败: {template_data}", "ERROR")
-            return
+            return False
+        valid, msg = self.check_template_moulds(template_data, username)
+        if not valid:
+            self.log(f"模板校验失败: {msg}", "ERROR")
+            return False
 
-        # 2. 登录
-        success, msg = self.login_manager.login(username, password)
-        if not success:
-            self.log(f"登录失败: {msg}", "ERROR")
-            return
-        
-        self.api = KfzClient(self.login_manager.session)
+        self.sink_class = get_sink_class(self.output_format)
+        # 记录任务参数，断点续跑时不再依赖原模板文件
+        self.journal = RunJournal(timestamp_dir)
+        self.results = ResultJournal(timestamp_dir)
+        self.journal.append({
+            "type": "run",
+            "username": username,
+            "template": template_data,
+            "options": {
+                "pipeline": self.pipeline,
+                "single_pass": self.single_pass,
+                "skip_unchanged": self.skip_unchanged,
+                "mould_filter": self.mould_filter,
+                "use_store": self.use_store,
+                "merge_results": self.merge_results,
+                "output_format": self.output_format,
+                "verify": self.verify
+            }
+        })
+        try:
+            return self._execute(timestamp_dir, template_data, username, password, start_time, JournalState())
+        finally:
+            self.journal.close()
+            self.results.close()
 
-        # 3. 获取并校验运费模板配置
-        success, config = self.api.get_base_select_data()
-        if not success:
-            self.log(f"获取运费模板配置失败: {config}", "ERROR")
-            return
+    def resume(self, run_dir, username, password):
+        """
+        断点续跑：按输出目录下的进度日志，从最后一个已落盘的断点继续
+        已保存的区间 CSV 直接复用，已完成的列表页和修改批次不会重复请求
+        :return: 任务是否全部完成 (与 run 相同；失败、停止时为 False)
+        """
+        self.stop_requested = False
+        start_time = datetime.now()
+        self.log(f"断点续跑，账号: {username}")
+        self.log(f"输出目录: {run_dir}")
+        self.run_dir = run_dir
+
+        journal = RunJournal(run_dir)
+        state = journal.load()
+        if state is None or state.run is None:
+            self.log(f"目录中没有可续跑的进度记录: {run_dir}", "ERROR")
+            return False
+        if state.done:
+            self.log("该任务已全部完成，无需续跑。", "WARNING")
+            return False
+        options = state.run.get("options", {})
+        if options.get("pipeline"):
+            self.log("流水线模式的任务不支持断点续跑，请重新运行。", "ERROR")
+            return False
+        if state.run.get("username") != username:
+            self.log(f"账号与原任务不一致 (原任务账号: {state.run.get('username')})", "ERROR")
+            return False
+
+        # 续跑必须沿用原任务的获取方式，否则页码断点没有意义
+        self.pipeline = False
+        self.single_pass = options.get("single_pass", False)
+        self.skip_unchanged = options.get("skip_unchanged", True)
+        self.mould_filter = options.get("mould_filter", False)
+        self.use_store = options.get("use_store", False)
+        self.merge_results = options.get("merge_results", True)
+        self.output_format = options.get("output_format", "csv")
+        self.verify = options.get("verify", False)
+        self.sink_class = get_sink_class(self.output_format)
+
+        self.journal = journal
+        self.results = ResultJournal(run_dir)
+        self.results.truncate(state.results_size)
+        try:
+            return self._execute(run_dir, state.run["template"], username, password, start_time, state)
+        finally:
+            self.journal.close()
+            self.results.close()
+
+    def merge(self, run_dir):
+        """
+        把任务输出目录下的结果日志合并回区间 CSV 的 result 列，不需要登录
+        用于创建任务时关闭了 merge_results，或合并过程中被中断的任务；已合并的区间跳过
+        """
+        self.stop_requested = False
+        self.run_dir = run_dir
+        state = RunJournal(run_dir).load()
+        if state is None or state.run is None:
+            self.log(f"目录中没有任务进度记录: {run_dir}", "ERROR")
+            return False
+        self.sink_class = get_sink_class(state.run.get("options", {}).get("output_format", "csv"))
+        extension = self.sink_class.extension
+        jobs = [{"count": state.counts.get(index, 0), "path": os.path.join(run_dir, job_filename(row, extension))}
+                for index, row in enumerate(state.run["template"])]
+        self.journal = RunJournal(run_dir)
+        self.results = ResultJournal(run_dir)
+        try:
+            self._merge_results(jobs, state)
+        finally:
+            self.journal.close()
+            self.results.close()
+        self.log(f"修改结果已合并回区间导出文件: {run_dir}")
+        return True
+
+    def _execute(self, timestamp_dir, template_data, username, password, start_time, state):
+        """登录后执行获取与批量修改；state 为断点状态，新任务时为空状态"""
+        # 2. 登录：优先复用保存的会话，创建客户端后请求一次接口确认会话有效
+        restored = self.reuse_session and self.login_manager.restore_session(username, password)
+        if restored:
+            self.log("使用已保存的登录会话")
+        else:
+            success, msg = self._login(username, password)
+            if not success:
+                self.log(f"登录失败: {msg}", "ERROR")
+                return False
         
-        mould_list = config.get("mouldList", [])
-        mould_map = {m['mouldName']: m['mouldId'] for m in mould_list}
+        # 同一账号共用一个限速器，请求节奏由限速器根据接口响应自适应调整
+        # 会话失效时 (包括任务进行中) 由 KfzClient 调用 _relogin 重新登录并重试失败的请求
+        self.metrics = RunMetrics()
+        self.api = KfzClient(self.login_manager.session, pool_size=self.fetch_workers,
+                             rate_limiter=get_rate_limiter(username), metrics=self.metrics,
+                             relogin=lambda: self._relogin(username, password))
+        if restored and not self._probe_session(username, password):
+            return False
+
+        # 3. 获取 (或读取缓存的) 运费模板配置并校验
+        catalog = self._load_catalog(username, template_data)
+        if catalog is None:
+            return False
+        self.mould_ids = catalog.mould_ids
         
         # 检查所有模板名字是否存在
+        moulds = []
         for row in template_data:
-            t_name = row['运费模板名字']
-            if t_name not in mould_map:
-                self.log(f"错误: 运费模板 '{t_name}' 不存在于当前店铺配置中。", "ERROR")
-                return
+            mould = catalog.lookup(row['运费模板名字'])
+            if mould is None:
+                self.log(f"错误: {catalog.describe_missing(row['运费模板名字'])}。", "ERROR")
+                return False
+            moulds.append(mould)
         
-        total_summary = {"success": 0, "fail": 0}
-        generated_files = []
-        job_stats = [] # 用于最后生成表格
-
-        # 4. 获取商品列表并保存 CSV
-        for row in template_data:
-            if self.stop_requested: break
-            
+        total_summary = self.summary = dict(state.summary)
+        self.conflicts = []
+        self.verification = None
+        self.incomplete = []
+        jobs = [] # 每个价格区间一个任务，同时用于最后生成表格
+        for index, row in enumerate(template_data):
             price_min = row['价格下限']
             price_max = row['价格上限']
-            t_name = row['运费模板名字']
-            mould_id = mould_map[t_name]
-            
-            filename = f"{price_min}-{price_max}>{t_name}.csv"
-            filepath = os.path.join(timestamp_dir, filename)
-            
-            self.log(f"正在获取价格区间 {price_min} - {price_max} 的商品...")
-            
-            # 使用流式写入：每获取一页就保存一批
-            fields = ['itemId', 'itemSn', 'name', 'qualityName', 'quality', 'price', 
-                      'realPrice', 'mouldId', 'mouldName', 'weight', 'result']
-            
-            total_items_count = 0
-            file_exists = False
-            
-            page = 1
-            while not self.stop_requested:
-                success, res = self.api.get_unsold_list(price_min, price_max, page=page, size=200)
-                if not success:
-                    self.log(f"获取商品列表失败 (page {page}): {res}")
-                    break
-                
-                page_data = res.get("productInfoPageResult", {})
-                item_list = page_data.get("list", [])
-                
-                if item_list:
-                    # 写入 CSV
-                    try:
-                        mode = 'w' if not file_exists else 'a'
-                        with open(filepath, mode, encoding='utf-8-sig', newline='') as f:
-                            writer = csv.DictWriter(f, fieldnames=fields)
-                            if not file_exists:
-                                writer.writeheader()
-                                file_exists = True
-                            
-                            for item in item_list:
-                                row_data = {k: item.get(k, '') for k in fields if k != 'result'}
-                                writer.writerow(row_data)
-                        
-                        total_items_count += len(item_list)
-                    except Exception as e:
-                        self.log(f"保存 CSV 页面数据失败: {e}")
-                        break
-                
-                pager = page_data.get("pager", {})
-                total_pages = pager.get("pages", 0)
-                
-                self.log(f"  已获取并保存第 {page}/{total_pages} 页，此区间累积 {total_items_count} 条")
-                
-                if page >= total_pages or not item_list:
-                    break
-                page += 1
-                time.sleep(0.5)
-
-            if total_items_count > 0:
-                generated_files.append({"path": filepath, "mould_id": mould_id, "count": total_items_count})
-                self.log(f"  区间处理完成: {filename} (共 {total_items_count} 条)")
-                job_stats.append({
-                    "range": f"{price_min}-{price_max}",
-                    "mould": t_name,
-                    "count": total_items_count
-                })
+            jobs.append({
+                "range": f"{price_min}-{price_max}",
+                "price_min": price_min,
+                "price_max": price_max,
+                "mould": moulds[index]['mouldName'],
+                "mould_id": moulds[index]['mouldId'],
+                "path": os.path.join(timestamp_dir, job_filename(row, self.sink_class.extension)),
+                "count": state.counts.get(index, 0)
+            })
+
+        self.band_index = PriceBandIndex(template_data) if self.single_pass else None
+
+        # 预检各区间的商品数，用于输出任务规划和分配获取线程
+        scan_total = self._preflight(jobs)
+        self._log_plan(jobs, scan_total)
+        if not state.units and not self.use_store and not self.mould_filter:
+            # 按区间筛选运费模板或同步本地库时实际获取的条数与预检不同，不提前给出获取总数
+            self.emit(PLANNED, total=scan_total if scan_total is not None else sum(
+                job['planned'] or 0 for job in jobs))
+
+        self.account = username
+        if self.use_store:
+            # 本地库的 sqlite 连接只在当前线程使用
+            self.store = ItemStore()
+        fetched_before = sum(job['count'] for job in jobs)
+        try:
+            if self.pipeline and not self.use_store:
+                # 4+5. 流水线模式：边获取边修改
+                started = time.perf_counter()
+                self._run_pipelined(jobs, total_summary)
+                self.metrics.record_phase("pipeline", sum(job['count'] for job in jobs),
+                                          time.perf_counter() - started)
             else:
-                self.log(f"  该区间无商品。", "WARNING")
-                job_stats.append({
-                    "range": f"{price_min}-{price_max}",
-                    "mould": t_name,
-                    "count": 0
-                })
+                # 4. 获取商品列表并保存 CSV
+                started = time.perf_counter()
+                self._restore_exports(jobs, state)
+                if self.use_store:
+                    if not self._sync_store():
+                        if not self.stop_requested:
+                            self.log("本地商品库同步失败，任务中止。", "ERROR")
+                        return False
+                    self._export_from_store(jobs, state)
+                else:
+                    self._export_jobs(jobs, state)
+                self.metrics.record_phase("fetch", sum(job['count'] for job in jobs) - fetched_before,
+                                          time.perf_counter() - started)
 
-        if self.stop_requested:
-            self.log("任务已停止。", "WARNING")
-            return
+                # 5. 批量修改 (获取不完整时不修改：合并结果会改写导出文件，续跑时先从断点继续获取)
+                if not self.incomplete and not self.stop_requested:
+                    started = time.perf_counter()
+                    summary_before = dict(total_summary)
+                    self._update_jobs(jobs, total_summary, state)
+                    # 只统计实际提交到批量修改接口的商品，无需修改/重复的商品单独计数，不计入吞吐
+                    delta = {key: total_summary[key] - summary_before[key] for key in RESULT_KEYS}
+                    self.metrics.record_phase("update", delta['success'] + delta['fail'],
+                                              time.perf_counter() - started,
+                                              skipped=delta['skipped'] + delta['duplicate'])
 
-        # 5. 批量修改
-        self.log("开始执行批量修改...")
-        for job in generated_files:
-            if self.stop_requested: break
-            
-            filepath = job['path']
-            mould_id = job['mould_id']
-            temp_filepath = filepath + ".tmp"
-            
-            self.log(f"正在处理文件: {os.path.basename(filepath)}，目标模板ID: {mould_id}")
-            
-            try:
-                batch_size = 200
-                with open(filepath, 'r', encoding='utf-8-sig') as f_in, \
-                     open(temp_filepath, 'w', encoding='utf-8-sig', newline='') as f_out:
-                    
-                    reader = csv.DictReader(f_in)
-                    fieldnames = reader.fieldnames
-                    writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    batch = []
-                    for row in reader:
-                        if self.stop_requested: break
-                        batch.append(row)
-                        
-                        if len(batch) >= batch_size:
-                            self._process_batch(batch, mould_id, writer, total_summary)
-                            batch = []
-                            time.sleep(1) # 每批次间隔
-                    
-                    # 处理剩余的
-                    if batch and not self.stop_requested:
-                        self._process_batch(batch, mould_id, writer, total_summary)
-                
-                # 替换原文件
-                if not self.stop_requested:
-                    os.replace(temp_filepath, filepath)
+            if self.verify and not self.stop_requested and not self.incomplete:
+                # 6. 复核：只查询仍使用其他运费模板的商品并重新提交
+                started = time.perf_counter()
+                self.verification = self._verify_jobs(jobs)
+                self.metrics.record_phase("verify", self.verification['found'], time.perf_counter() - started)
+
+            # 7. 合并结果 (复核重新修改的结果也追加在结果日志中，复核之后再合并)；
+            # 有文件未处理完时不合并，避免被标记为 file_done 后续跑时跳过。
+            # 流水线模式的结果已直接写入导出文件，只有复核重新修改过商品时才需要合并
+            resubmitted = self.verification and self.verification['found'] > self.verification['failed']
+            pending = not self.pipeline or bool(resubmitted)
+            if pending and not self.stop_requested and not self.incomplete:
+                if self.merge_results:
+                    self.log("正在把修改结果合并回区间导出文件...")
+                    self._merge_results(jobs, state)
                 else:
-                    if os.path.exists(temp_filepath): os.remove(temp_filepath)
-                    
-            except Exception as e:
-                self.log(f"处理文件 {filepath} 失败: {e}", "ERROR")
-                if os.path.exists(temp_filepath): os.remove(temp_filepath)
+                    self.log(f"修改结果已记录在 {RESULTS_FILENAME}，可稍后合并回区间导出文件")
+        finally:
+            if self.store:
+                self.store.close()
+                self.store = None
+            # 停止或中止时也保存，便于分析慢在哪里
+            self.metrics.save(os.path.join(timestamp_dir, METRICS_FILENAME))
+
+        if self.stop_requested:
+            self.log("任务已停止，可通过断点续跑继续。", "WARNING")
+            return False
+        if self.incomplete:
+            names = "、".join(self.incomplete[:MAX_INCOMPLETE_LINES])
+            if len(self.incomplete) > MAX_INCOMPLETE_LINES:
+                names += f" 等 {len(self.incomplete)} 个"
+            hint = "请重新运行" if self.pipeline else "可通过断点续跑继续"
+            self.log(f"任务未完成，以下获取单元或文件未处理完: {names}，{hint}。", "ERROR")
+            return False
 
-        # 6. 汇总结果
+        # 8. 汇总结果
         end_time = datetime.now()
         duration = end_time - start_time
         
@@ -237,60 +498,1044 @@ class FreightBatchProcessor:
         lines.append(f"总耗时: {str(duration).split('.')[0]}")
         lines.append(f"成功总数: {total_summary['success']}")
         lines.append(f"失败总数: {total_summary['fail']}")
+        lines.append(f"无需修改: {total_summary['skipped']}")
+        lines.append(f"跨区间重复: {total_summary['duplicate']}")
         lines.append("-" * 40)
         lines.append("价格模板详情:")
-        for s in job_stats:
+        for s in jobs:
             lines.append(f"- [{s['range']}] {s['mould']}: {s['count']} 条")
+        if self.conflicts:
+            lines.extend(self._conflict_lines(jobs))
+        if self.verification:
+            lines.extend(self._verification_lines(jobs))
+        lines.append("-" * 40)
+        lines.extend(self.metrics.summary_lines())
         lines.append("=" * 40)
         
         summary_content = "\n".join(lines)
         
         with open(summary_file, 'w', encoding='utf-8-sig') as f:
             f.write(summary_content)
+        self.journal.append({"type": "done"})
         
         self.log("任务全部完成。")
         self.log(f"\n{summary_content}")
+        return True
 
-    def _process_batch(self, batch, mould_id, writer, total_summary):
-        """执行单批次更新并写入结果"""
-        item_ids = [int(item['itemId']) for item in batch]
-        # 默认 0.5
-        weight = '0.5'
-        success, res = self.api.batch_update_freight(item_ids, mould_id, weight)
-        
-        success_ids = []
-        fail_ids = []
-        batch_result_msg = ""
+    def _login(self, username, password):
+        """登录并保存会话"""
+        success, msg = self.login_manager.login(username, password)
+        if success and self.reuse_session:
+            self.login_manager.save_session(username, password)
+        return success, msg
 
+    def _probe_session(self, username, password):
+        """
+        确认恢复的会话仍然有效：请求一次 size=1 的商品列表
+        服务端表示登录失效的方式不一定能被识别，因此除网络错误、超时外的任何失败都按会话失效处理：
+        删除缓存的会话，重新登录后再试一次
+        :return: 是否可以继续任务
+        """
+        success, res = self.api.get_unsold_list('', '', page=1, size=1)
+        if self.stop_requested:
+            return False
+        if success or getattr(res, 'transport', False):
+            # 网络错误与会话无关，由之后的请求重试
+            return True
+        self.log(f"保存的登录会话不可用 ({res})，重新登录", "WARNING")
+        self.login_manager.clear_session(username)
+        success, msg = self._login(username, password)
+        if not success:
+            self.log(f"登录失败: {msg}", "ERROR")
+            return False
+        success, res = self.api.get_unsold_list('', '', page=1, size=1)
+        if not success and not getattr(res, 'transport', False):
+            self.log(f"重新登录后请求商品列表仍失败: {res}", "ERROR")
+            return False
+        return True
+
+    def _relogin(self, username, password):
+        """会话失效时重新登录 (在请求线程中调用)；失败时停止任务，已完成的进度可断点续跑"""
+        self.log("登录已失效，正在重新登录...", "WARNING")
+        success, msg = self._login(username, password)
         if success:
-            # 兼容处理：有些 API 结果可能没返回具体的 successIds 列表但 status 是 true
-            raw_success_ids = res.get('successIds', [])
-            success_ids = [str(x) for x in raw_success_ids]
-            fail_ids = [str(x) for x in res.get('failIds', [])]
-            batch_result_msg = res.get('message', '成功')
-            
-            # 如果 API 没有明确给出 successIds，则认为当前批次请求的都成功了（防止统计为0）
-            if not success_ids and not fail_ids:
-                total_summary['success'] += len(item_ids)
-                batch_result_msg = f"成功 (全量)"
+            self.log("重新登录成功，继续任务")
+        else:
+            self.login_manager.clear_session(username)
+            self.log(f"重新登录失败: {msg}，任务停止，可稍后断点续跑", "ERROR")
+            self.stop()
+        return success, msg
+
+    def _restore_exports(self, jobs, state):
+        """把区间导出文件截断到最后一个已记录的页，丢弃崩溃前写了一半的数据"""
+        for index, job in enumerate(jobs):
+            path = job['path']
+            # 已开始批量修改的区间早已获取完毕，文件可能已在合并结果时替换，不能再截断
+            if index in state.files_done or index in state.batches or not os.path.exists(path):
+                continue
+            if index in state.sizes:
+                self.sink_class.truncate(path, state.sizes[index])
             else:
-                total_summary['success'] += len(success_ids)
-                total_summary['fail'] += len(fail_ids)
+                os.remove(path)
+
+    def _export_jobs(self, jobs, state):
+        """
+        获取每个价格区间的商品并保存到导出文件，每个区间的文件在获取期间只打开一次
+        每页写入缓冲区，记录断点前 flush + fsync，断点中记录的位置之前的数据都已落盘
+        """
+        sinks = {} # 区间序号 -> 导出 sink，首次写入时打开 (续跑时追加到已截断的文件)
+
+        def make_sink(index):
+            def write_items(item_list):
+                with self.metrics.timed("csv_write"):
+                    if index not in sinks:
+                        path = jobs[index]['path']
+                        sinks[index] = self.sink_class(path, append=os.path.exists(path))
+                    sinks[index].write(item_list)
+            return write_items
+
+        def checkpoint(unit, page, counts):
+            with self.metrics.timed("csv_write"):
+                sizes = {index: sinks[index].flush(sync=True) for index in counts}
+            self.journal.append({"type": "page", "unit": unit, "page": page, "counts": counts, "sizes": sizes})
+
+        try:
+            self._fetch_jobs(jobs, make_sink, state, checkpoint)
+        finally:
+            for sink in sinks.values():
+                sink.close()
+
+    def _sync_store(self):
+        """
+        把出售中商品同步到本地库
+        首次使用或距上次完整同步超过 FULL_SYNC_INTERVAL 时完整同步 (并清理已不在售的商品)，
+        否则只拉取上次同步之后更新或新建的商品
+        :return: 是否同步完成
+        """
+        now = datetime.now()
+        last_sync, last_full_sync = self.store.get_sync_state(self.account)
+        full = self.full_sync or last_full_sync is None or now - last_full_sync > FULL_SYNC_INTERVAL
+
+        def on_page(page, item_list):
+            self.store.upsert(self.account, item_list, now)
+
+        if full:
+            self.log("正在完整同步本地商品库...")
+            count, finished = self._fetch_range('', '', on_page)
         else:
-            batch_result_msg = f"失败: {res}"
-            total_summary['fail'] += len(item_ids)
+            start, end = sync_window(last_sync, now)
+            self.log(f"正在增量同步本地商品库 ({start} 之后更新或新建的商品)...")
+            updated, finished_update = self._fetch_range('', '', on_page, start_update_time=start,
+                                                         end_update_time=end)
+            created, finished_create = self._fetch_range('', '', on_page, start_create_time=start)
+            count, finished = updated + created, finished_update and finished_create
 
+        if not finished or self.stop_requested:
+            return False
+        if full:
+            removed = self.store.remove_stale(self.account, now)
+            self.log(f"  完整同步完成: {count} 条，清理已不在售商品 {removed} 条")
+        else:
+            self.log(f"  增量同步完成: 更新 {count} 条，本地库共 {self.store.count(self.account)} 条")
+        self.store.set_sync_state(self.account, now, full)
+        return True
+
+    def _export_from_store(self, jobs, state):
+        """按价格区间从本地库查询商品并导出，每个区间作为一个获取单元记录断点"""
+        for index, job in enumerate(jobs):
+            if self.stop_requested: break
+            unit = f"store:{index}"
+            if state.units.get(unit, {}).get('done'):
+                continue
+
+            exclude = job['mould_id'] if self.mould_filter else None
+            rows = self.store.query_band(self.account, job['price_min'], job['price_max'], exclude_mould=exclude)
+            count = 0
+            sink = None
+            chunk = list(islice(rows, EXPORT_CHUNK))
+            try:
+                while chunk:
+                    with self.metrics.timed("csv_write"):
+                        sink = sink or self.sink_class(job['path'])
+                        sink.write(chunk)
+                    count += len(chunk)
+                    chunk = list(islice(rows, EXPORT_CHUNK))
+                size = sink.flush(sync=True) if sink else 0
+            finally:
+                if sink:
+                    sink.close()
+
+            job['count'] = count
+            if count:
+                self.journal.append({"type": "page", "unit": unit, "page": 1, "counts": {index: count},
+                                     "sizes": {index: size}})
+            self.journal.append({"type": "unit", "unit": unit})
+            self._log_job_fetched(job)
+
+    def _preflight(self, jobs):
+        """
+        预检：每个区间请求一次 size=1 的列表，只读取 pager.total 作为该区间的商品数 (job['planned'])，
+        各区间并发请求；单次扫描模式下另外查询一次全部商品数
+        :return: 全部出售中商品数，非单次扫描模式或查询失败时为 None
+        """
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="preflight") as pool:
+            futures = [pool.submit(self._count_items, job['price_min'], job['price_max']) for job in jobs]
+            scan = pool.submit(self._count_items, '', '') if self.band_index is not None else None
+            for job, future in zip(jobs, futures):
+                job['planned'] = future.result()
+            return scan.result() if scan else None
+
+    def _count_items(self, price_min, price_max, **filters):
+        """请求一次 size=1 的列表，返回价格区间内 (符合 filters 筛选) 的商品数，失败时返回 None"""
+        success, res = self.api.get_unsold_list(price_min, price_max, page=1, size=1, **filters)
+        if not success:
+            self.log(f"查询价格区间 {price_min} - {price_max} 的商品数失败: {res}", "WARNING")
+            return None
+        return res.get("productInfoPageResult", {}).get("pager", {}).get("total", 0)
+
+    def _split_band(self, job):
+        """
+        商品数超过 SPLIT_THRESHOLD 的区间按价格 (分) 二分，直到每个子区间不超过阈值或已无法再分
+        :return: 子区间列表 [(价格下限, 价格上限), ...]，按价格排序；无需拆分时只有区间本身
+        """
+        if (job.get('planned') or 0) <= SPLIT_THRESHOLD:
+            return [(job['price_min'], job['price_max'])]
+        return self._split_range(job['price_min'], job['price_max'], job['planned'])
+
+    def _split_range(self, price_min, price_max, total, **filters):
+        """
+        价格区间按价格 (分) 二分，直到每个子区间 (符合 filters 筛选) 的商品数不超过 SPLIT_THRESHOLD 或已无法再分
+        :param total: 整个区间的商品数
+        :return: 子区间列表 [(价格下限, 价格上限), ...]，按价格排序
+        """
+        pending = [(to_cents(price_min), to_cents(price_max, upper=True), total)]
+        ranges = []
+        while pending:
+            low, high, count = pending.pop()
+            if count <= SPLIT_THRESHOLD or low >= high:
+                ranges.append((low, high))
+                continue
+            mid = (low + high) // 2
+            left = self._count_items(from_cents(low), from_cents(mid), **filters)
+            right = self._count_items(from_cents(mid + 1), from_cents(high), **filters)
+            if left is None or right is None:
+                ranges.append((low, high))
+                continue
+            pending.append((low, mid, left))
+            pending.append((mid + 1, high, right))
+        ranges.sort()
+        return [(from_cents(low), from_cents(high)) for low, high in ranges]
+
+    def _log_plan(self, jobs, scan_total):
+        """输出任务规划：各区间商品数、获取与修改需要的请求数、按当前限速估算的耗时"""
+        planned = [job['planned'] or 0 for job in jobs]
+        total = sum(planned)
+        if scan_total is not None:
+            fetch_calls = math.ceil(scan_total / PAGE_SIZE)
+        else:
+            fetch_calls = sum(math.ceil(n / PAGE_SIZE) for n in planned)
+        update_calls = sum(math.ceil(n / BATCH_SIZE) for n in planned)
+        list_rate = self.api.rate_limiter.current_rate("list")
+        update_rate = self.api.rate_limiter.current_rate("update")
+        fetch_seconds = fetch_calls / list_rate
+        update_seconds = update_calls / update_rate
+        seconds = int(max(fetch_seconds, update_seconds) if self.pipeline else fetch_seconds + update_seconds)
+
+        self.log("任务规划:")
+        for job in jobs:
+            planned_text = "预检失败" if job['planned'] is None else f"{job['planned']} 条"
+            self.log(f"  [{job['range']}] {job['mould']}: {planned_text}")
+        self.log(f"  共 {total} 条，获取约需请求 {fetch_calls} 次，批量修改最多请求 {update_calls} 次")
+        self.log(f"  按当前限速 (列表 {list_rate:.1f} 次/秒，修改 {update_rate:.1f} 次/秒) "
+                 f"预计耗时约 {seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}")
+
+    def _allocate_workers(self, jobs):
+        """按预检的商品数在区间之间分配 fetch_workers 个获取线程，商品多的区间分得多，每个区间至少 1 个"""
+        planned = [job.get('planned') or 0 for job in jobs]
+        total = sum(planned)
+        if not total:
+            return [self.fetch_workers] * len(jobs)
+        return [max(1, round(self.fetch_workers * n / total)) for n in planned]
+
+    def _fetch_jobs(self, jobs, make_sink, state=None, checkpoint=None, ordered=False):
+        """
+        获取所有区间的商品，每页按区间交给 make_sink(序号) 返回的 sink(item_list) 处理
+        默认多个区间同时获取；ordered=True 时按模板行顺序逐个获取 (每个区间使用全部线程)，
+        保证序号较小的区间先交给 sink
+        单次扫描模式 (self.band_index 不为空) 下只遍历一次不带价格筛选的列表，
+        在本地按价格区间分桶，请求数约为 商品总数/200，与区间个数无关
+        每个获取单元 (区间 / 区间+运费模板 / 单次扫描) 的每一页处理完后调用 checkpoint(单元, 页码, {序号: 条数})，
+        state 中已完成的单元跳过，未完成的从下一页继续
+        """
+        state = state or JournalState()
+        sinks = [make_sink(i) for i in range(len(jobs))]
+
+        def fetch_unit(unit, price_min, price_max, dispatch, shipping_mould="", workers=None, lock=None):
+            progress = state.units.get(unit, {"page": 0, "done": False})
+            if progress['done']:
+                return
+            if progress['page']:
+                self.log(f"  从第 {progress['page'] + 1} 页继续获取")
+
+            def on_page(page, item_list):
+                # 同一区间的子区间并发获取时，写入与断点记录需要整体串行，保证断点记录的字节数覆盖之前写入的所有页
+                with lock or nullcontext():
+                    counts = dispatch(item_list)
+                    if checkpoint:
+                        checkpoint(unit, page, counts)
+
+            _, finished = self._fetch_range(price_min, price_max, on_page, start_page=progress['page'] + 1,
+                                            workers=workers, shipping_mould=shipping_mould)
+            if finished:
+                if checkpoint:
+                    self.journal.append({"type": "unit", "unit": unit})
+            elif not self.stop_requested:
+                # 重试后仍失败的页：该单元不记为完成，任务结束时不标记 done，续跑时从最后一个断点继续
+                self.incomplete.append(unit)
+
+        if self.band_index is None:
+            workers = [self.fetch_workers] * len(jobs) if ordered else self._allocate_workers(jobs)
+
+            def fetch_job(index):
+                if self.stop_requested:
+                    return
+                job = jobs[index]
+
+                def dispatch(item_list):
+                    sinks[index](item_list)
+                    job['count'] += len(item_list)
+                    return {index: len(item_list)}
+
+                self.log(f"正在获取价格区间 {job['price_min']} - {job['price_max']} 的商品 "
+                         f"(线程数: {workers[index]})...")
+                # 续跑时沿用原任务的拆分，否则子区间的页码断点对不上
+                ranges = state.splits.get(index)
+                if ranges is None:
+                    ranges = self._split_band(job)
+                    if len(ranges) > 1:
+                        self.journal.append({"type": "split", "job": index, "ranges": ranges})
+                if len(ranges) == 1:
+                    fetch_band(index, '', job['price_min'], job['price_max'], dispatch, workers[index])
+                else:
+                    # 子区间各自翻页 (深度不超过 MAX_PAGE_DEPTH)，并发获取后写入同一个区间 CSV
+                    self.log(f"  区间商品数 {job['planned']} 超过 {SPLIT_THRESHOLD}，按价格拆分为 {len(ranges)} 个子区间")
+                    lock = threading.Lock()
+                    with ThreadPoolExecutor(max_workers=workers[index], thread_name_prefix="subrange") as pool:
+                        futures = [pool.submit(fetch_band, index, f"/{k}", price_min, price_max, dispatch, 1, lock)
+                                   for k, (price_min, price_max) in enumerate(ranges)]
+                        for future in futures:
+                            future.result()
+                self._log_job_fetched(job)
+
+            def fetch_band(index, suffix, price_min, price_max, dispatch, band_workers, lock=None):
+                """获取区间 (或子区间)，单元名为 序号[/子区间序号][:运费模板]"""
+                if self.mould_filter:
+                    # 只拉取使用其他模板的商品，已是目标模板的商品不下载
+                    for mould_id in self.mould_ids:
+                        if str(mould_id) == str(jobs[index]['mould_id']) or self.stop_requested:
+                            continue
+                        fetch_unit(f"{index}{suffix}:{mould_id}", price_min, price_max, dispatch,
+                                   shipping_mould=mould_id, workers=band_workers, lock=lock)
+                else:
+                    fetch_unit(f"{index}{suffix}", price_min, price_max, dispatch, workers=band_workers, lock=lock)
+
+            todo = [i for i in range(len(jobs)) if i not in state.files_done]
+            if ordered:
+                for i in todo:
+                    fetch_job(i)
+                return
+            # 多个区间同时获取，商品多的区间先开始
+            todo.sort(key=lambda i: jobs[i].get('planned') or 0, reverse=True)
+            if not todo:
+                return
+            with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(todo)),
+                                    thread_name_prefix="band") as pool:
+                for future in [pool.submit(fetch_job, i) for i in todo]:
+                    future.result()
+            return
+
+        if self.mould_filter:
+            self.log("单次扫描模式下不支持按运费模板筛选，将获取全部商品", "WARNING")
+        self.log("正在单次扫描全部出售中商品，并在本地按价格区间分桶...")
+        unmatched = {"count": 0}
+
+        def dispatch(item_list):
+            buckets = {}
+            for item in item_list:
+                index = self.band_index.lookup_cents(item.price_cents)
+                if index is None:
+                    unmatched['count'] += 1
+                    continue
+                buckets.setdefault(index, []).append(item)
+            for index, items in buckets.items():
+                sinks[index](items)
+                jobs[index]['count'] += len(items)
+            return {index: len(items) for index, items in buckets.items()}
+
+        fetch_unit("scan", '', '', dispatch)
+        for job in jobs:
+            self._log_job_fetched(job)
+        if unmatched['count']:
+            self.log(f"  有 {unmatched['count']} 条商品价格不在任何区间内，已跳过", "WARNING")
+
+    def _log_job_fetched(self, job):
+        if job['count'] > 0:
+            self.log(f"  区间处理完成: {os.path.basename(job['path'])} (共 {job['count']} 条)")
+        else:
+            self.log(f"  该区间无商品。", "WARNING")
+
+    def _update_jobs(self, jobs, total_summary, state):
+        """
+        按目标运费模板分组批量修改：同一模板的多个区间 CSV 依次读取、共用批次，
+        除每个模板的最后一批外每批都凑满 200 条；结果先追加到结果日志，复核之后再一次性合并回各区间 CSV
+        """
+        self.log("开始执行批量修改...")
+        pending = [(index, job) for index, job in enumerate(jobs) if job['count'] and index not in state.files_done]
+        self.emit(UPDATE_STARTED, label="批量修改", total=sum(
+            job['count'] - state.batches.get(index, {}).get('rows', 0) for index, job in pending))
+
+        duplicates = self._find_duplicates(jobs)
+        groups = {} # 运费模板 ID -> 区间序号列表，保持模板行顺序
+        for index, job in pending:
+            groups.setdefault(str(job['mould_id']), []).append(index)
+        for indexes in groups.values():
+            if self.stop_requested: break
+            try:
+                self._update_group(jobs, indexes, total_summary, state, duplicates)
+            except Exception as e:
+                # 断点续跑时从最后一个已提交的批次继续
+                names = ", ".join(os.path.basename(jobs[i]['path']) for i in indexes)
+                self.log(f"处理文件 {names} 失败: {e}", "ERROR")
+                self.incomplete.append(names)
+
+
+    def _find_duplicates(self, jobs):
+        """
+        按模板行顺序扫描所有区间导出文件的 itemId，找出落入多个区间的商品 (价格在边界上或获取期间改价)
+        规则：商品归属于序号最小的区间，其他区间中的该商品不提交修改，冲突记录到 self.conflicts
+        只用紧凑的 ItemIdSet 记录 ID，只有冲突的商品占用字典
+        :return: {区间序号: {itemId: 采用的区间序号}}
+        """
+        claims = ItemClaims()
+        duplicates = {}
+        for index, job in enumerate(jobs):
+            if not job['count'] or not os.path.exists(job['path']):
+                continue
+            for record in self.sink_class.read(job['path']):
+                item_id = record.item_id
+                owner = claims.claim(index, item_id)
+                if owner is not None:
+                    duplicates.setdefault(index, {})[item_id] = owner
+                    self.conflicts.append((item_id, owner, index))
+        if self.conflicts:
+            self.log(f"发现 {len(self.conflicts)} 个商品同时出现在多个区间，只按序号最小的区间修改", "WARNING")
+        return duplicates
+
+    def _conflict_lines(self, jobs):
+        """结果.txt 中的跨区间重复明细"""
+        different = sum(1 for _, owner, index in self.conflicts
+                        if str(jobs[owner]['mould_id']) != str(jobs[index]['mould_id']))
+        lines = ["-" * 40, f"跨区间重复商品 (目标模板不同: {different} 个):"]
+        for item_id, owner, index in self.conflicts[:MAX_CONFLICT_LINES]:
+            lines.append(f"- {item_id}: 采用 [{jobs[owner]['range']}] {jobs[owner]['mould']}，"
+                         f"跳过 [{jobs[index]['range']}] {jobs[index]['mould']}")
+        if len(self.conflicts) > MAX_CONFLICT_LINES:
+            lines.append(f"- ... 共 {len(self.conflicts)} 个，其余见各区间 CSV 的 result 列")
+        return lines
+
+    def _update_group(self, jobs, indexes, total_summary, state, duplicates):
+        """
+        批量修改目标模板相同的一组区间，只读取区间导出文件，结果追加到结果日志
+        每批完成后结果日志落盘，并为所涉及的区间记录 已处理行数/itemId 范围，续跑时跳过已处理的行
+        :param duplicates: _find_duplicates 的结果，其中的商品标记为重复、不提交修改
+        """
+        mould_id = jobs[indexes[0]]['mould_id']
+        with ExitStack() as stack:
+            files = []
+            for index in indexes:
+                job = jobs[index]
+                progress = state.batches.get(index)
+                self.log(f"正在处理文件: {os.path.basename(job['path'])}，目标模板ID: {mould_id}")
+                if progress:
+                    self.log(f"  跳过已处理的 {progress['rows']} 条 (最后一个 itemId: {progress['last']})")
+                reader = stack.enter_context(closing(self.sink_class.read(job['path'])))
+                rows_done = progress['rows'] if progress else 0
+                files.append({
+                    "index": index,
+                    "job": job,
+                    "reader": reader,
+                    "rows": rows_done,
+                    "committed": rows_done,
+                    "first": None,
+                    "last": None,
+                    "results": [], # 上次断点之后的 (itemId, 结果)
+                    "duplicates": duplicates.get(index, {}),
+                    "delta": dict.fromkeys(RESULT_KEYS, 0)
+                })
+
+            def commit():
+                # 结果日志落盘后再记录断点，保证断点之前的结果都已持久化
+                touched = [ctx for ctx in files if ctx['rows'] > ctx['committed']]
+                if not touched:
+                    return
+                with self.metrics.timed("results_write"):
+                    size = self.results.append(
+                        [(ctx['index'], item_id, result) for ctx in touched for item_id, result in ctx['results']])
+                for ctx in touched:
+                    record = {
+                        "type": "batch",
+                        "job": ctx['index'],
+                        "rows": ctx['rows'],
+                        "results": size,
+                        "first": ctx['first'],
+                        "last": ctx['last']
+                    }
+                    record.update(ctx['delta'])
+                    self.journal.append(record)
+                    skipped = ctx['delta']['skipped'] + ctx['delta']['duplicate']
+                    if skipped:
+                        self.emit(BATCH_UPDATED, label=os.path.basename(ctx['job']['path']), items=skipped,
+                                  skipped=skipped)
+                    ctx.update(committed=ctx['rows'], first=None, results=[], delta=dict.fromkeys(RESULT_KEYS, 0))
+
+            def flush(batch):
+                success_ids = self._process_batch([record for _, record in batch], mould_id, total_summary)
+                self._apply_to_store(success_ids, jobs[indexes[0]])
+                for ctx, record in batch:
+                    ctx['results'].append((record.item_id, record.result))
+                    ctx['delta']['success' if record.result == '成功' else 'fail'] += 1
+                # 批次中的行都已有结果，所有已读到的行都可以记录断点
+                commit()
+
+            batch = [] # (区间上下文, ItemRecord)，可能跨越多个区间
+            for ctx in files:
+                for position, record in enumerate(ctx['reader']):
+                    if position < ctx['rows']: continue
+                    if self.stop_requested: break
+                    ctx['rows'] = position + 1
+                    if ctx['first'] is None:
+                        ctx['first'] = record.item_id
+                    ctx['last'] = record.item_id
+                    owner = ctx['duplicates'].get(record.item_id)
+                    if owner is not None:
+                        ctx['results'].append((record.item_id, f"{DUPLICATE_RESULT} [{jobs[owner]['range']}]"))
+                        ctx['delta']['duplicate'] += 1
+                        total_summary['duplicate'] += 1
+                        continue
+                    if self._is_unchanged(record, mould_id):
+                        ctx['results'].append((record.item_id, UNCHANGED_RESULT))
+                        ctx['delta']['skipped'] += 1
+                        total_summary['skipped'] += 1
+                        continue
+                    batch.append((ctx, record))
+
+                    if len(batch) >= BATCH_SIZE:
+                        flush(batch)
+                        batch = []
+
+            # 处理剩余的 (停止时未提交的行不计入断点，续跑时重新处理)
+            if self.stop_requested:
+                return
+            if batch:
+                flush(batch)
+            commit()
+
+    def _merge_results(self, jobs, state):
+        """
+        把结果日志写回各区间导出文件的 result 列 (文本格式流式写入 .tmp 后替换原文件，SQLite 直接更新)
+        结果日志中没有的商品保留文件中原有的结果 (流水线模式下只有复核的结果记录在结果日志中)
+        """
+        results = self.results.load()
+        for index, job in enumerate(jobs):
+            if self.stop_requested: break
+            if not job['count'] or index in state.files_done or not os.path.exists(job['path']):
+                continue
+            if not results.has_job(index):
+                continue
+            with self.metrics.timed("csv_write"):
+                self.sink_class.merge(job['path'], lambda record: results.get(index, record.item_id) or record.result)
+            self.journal.append({"type": "file_done", "job": index})
+
+    def _run_pipelined(self, jobs, total_summary):
+        """
+        流水线模式：生产者线程按区间获取商品，目标模板相同的商品 (可能来自多个区间) 凑满 200 条即作为一个批次放入有界队列，
+        update_workers 个修改线程从队列取批次立即调用批量修改，并把带 result 的行写入区间导出文件。
+        队列满时生产者阻塞，内存中最多缓存 update_workers * 2 个批次。
+        总耗时约为 max(获取, 修改)，而不是两者之和。
+        """
+        self.log(f"开始流水线执行 (修改线程数: {self.update_workers})...")
+        batch_queue = queue.Queue(maxsize=self.update_workers * 2)
+        sinks = {} # job 序号 -> 导出 sink，首次写入时创建
+
+        def get_writer(index):
+            with self._result_lock:
+                if index not in sinks:
+                    sinks[index] = self.sink_class(jobs[index]['path'])
+                return sinks[index]
+
+        def consume():
+            while True:
+                task = batch_queue.get()
+                try:
+                    if task is None:
+                        return
+                    mould_id, items = task
+                    batch = [(get_writer(index), record) for index, record in items]
+                    # 已停止时已获取但未修改的商品照常落盘，result 留空
+                    if not self.stop_requested:
+                        self._process_batch([record for _, record in batch], mould_id, total_summary)
+                    with self._result_lock, self.metrics.timed("csv_write"):
+                        for sink, record in batch:
+                            sink.write([record])
+                except Exception as e:
+                    # 批次中的商品没有写入导出文件，任务不能记为完成
+                    names = ", ".join(sorted({os.path.basename(jobs[index]['path']) for index, _ in items}))
+                    self.log(f"处理批次失败 ({names}): {e}", "ERROR")
+                    self.incomplete.append(names)
+                finally:
+                    batch_queue.task_done()
+
+        consumers = [threading.Thread(target=consume, name=f"update-{i}", daemon=True)
+                     for i in range(self.update_workers)]
+        for t in consumers:
+            t.start()
+
+        # 运费模板 ID -> 未满 200 条的待提交 (job 序号, ItemRecord)，目标模板相同的区间共用，多个线程同时获取时加锁
+        buffers = {}
+        buffers_lock = threading.Lock()
+        # 边获取边修改时无法等所有区间获取完再判断：区间按模板行顺序逐个获取，
+        # 同一商品 (获取期间改价) 以最先获取到、即序号最小的区间为准，与非流水线模式的规则一致
+        claims = ItemClaims()
+
+        def make_sink(index):
+            mould_id = jobs[index]['mould_id']
+
+            def enqueue_items(item_list):
+                unchanged = []
+                changed = []
+                for record in item_list:
+                    owner = claims.claim(index, record.item_id)
+                    if owner is not None:
+                        self.conflicts.append((record.item_id, owner, index))
+                        record.result = f"{DUPLICATE_RESULT} [{jobs[owner]['range']}]"
+                        unchanged.append(record)
+                        with self._result_lock:
+                            total_summary['duplicate'] += 1
+                    elif self._is_unchanged(record, mould_id):
+                        record.result = UNCHANGED_RESULT
+                        unchanged.append(record)
+                    else:
+                        changed.append((index, record))
+                if unchanged:
+                    sink = get_writer(index)
+                    with self._result_lock:
+                        sink.write(unchanged)
+                        total_summary['skipped'] += sum(1 for record in unchanged if record.result == UNCHANGED_RESULT)
+                    self.emit(BATCH_UPDATED, items=len(unchanged), skipped=len(unchanged))
+                full = []
+                with buffers_lock:
+                    buffer = buffers.setdefault(str(mould_id), [])
+                    buffer.extend(changed)
+                    while len(buffer) >= BATCH_SIZE:
+                        full.append(buffer[:BATCH_SIZE])
+                        del buffer[:BATCH_SIZE]
+                # 队列满时在锁外阻塞，不影响其他区间往缓冲区追加
+                for batch in full:
+                    batch_queue.put((mould_id, batch))
+            return enqueue_items
+
+        try:
+            self._fetch_jobs(jobs, make_sink, ordered=True)
+            for job in jobs:
+                buffer = buffers.pop(str(job['mould_id']), None)
+                if buffer:
+                    batch_queue.put((job['mould_id'], buffer))
+        finally:
+            for _ in consumers:
+                batch_queue.put(None)
+            for t in consumers:
+                t.join()
+            for sink in sinks.values():
+                sink.close()
+        if self.conflicts:
+            self.log(f"发现 {len(self.conflicts)} 个商品同时出现在多个区间，只按序号最小的区间修改", "WARNING")
+
+    def _verify_jobs(self, jobs):
+        """
+        复核：按 (区间, 非目标运费模板) 用 shippingMould 并发查询，得到区间内仍未改好的商品，
+        只把这些商品重新提交修改 (结果追加到结果日志，随后合并回区间导出文件)，不必重新下载全部商品；之后再查一遍有遗留的组，
+        并为每个区间查询一次已使用目标运费模板的商品数 (job['verified'])
+        批量修改接口未返回 successIds 时整批按成功计，复核能发现其中实际没有改好的商品；
+        批量修改阶段已记录为失败的商品 (失败原因已知，重新提交大多仍会失败并触发拆分重试) 不重新提交，计入未改好；
+        未设置运费模板的商品无法按模板筛选，不在复核范围内
+        :return: dict(queries, errors, found, failed, success, fail, remaining, truncated)
+        """
+        # 跨区间重复的商品只按采用的区间复核，避免在两个区间之间来回修改
+        claimed = {item_id: owner for item_id, owner, _ in self.conflicts}
+        units = [(index, mould_id) for index, job in enumerate(jobs)
+                 for mould_id in self.mould_ids if mould_id != job['mould_id']]
+        self.log(f"开始复核: 按运费模板查询 {len(units)} 组 (区间 × 非目标模板)")
+        stragglers, errors, truncated = self._find_stragglers(jobs, units, claimed)
+        found = sum(len(records) for records in stragglers.values())
+        verification = {"queries": len(units), "errors": errors, "found": found, "failed": 0,
+                        "success": 0, "fail": 0, "remaining": 0, "truncated": truncated}
+
+        if found and not self.stop_requested:
+            results = self._load_update_results(jobs)
+            resubmit = {}
+            for (index, mould_id), records in stragglers.items():
+                records = [record for record in records
+                           if not results.get(index, record.item_id).startswith(FAILED_RESULT)]
+                if records:
+                    resubmit[(index, mould_id)] = records
+            verification['failed'] = found - sum(len(records) for records in resubmit.values())
+            verification['remaining'] = verification['failed']
+            self.log(f"复核发现 {found} 条商品仍使用其他运费模板，其中 {verification['failed']} 条在批量修改时已失败，"
+                     f"重新提交其余 {found - verification['failed']} 条")
+            requeue_summary = dict.fromkeys(RESULT_KEYS, 0)
+            by_job = {}
+            for (index, _), records in resubmit.items():
+                by_job.setdefault(index, []).extend(records)
+            for index, records in by_job.items():
+                job = jobs[index]
+                for start in range(0, len(records), BATCH_SIZE):
+                    if self.stop_requested:
+                        break
+                    batch = records[start:start + BATCH_SIZE]
+                    self._apply_to_store(self._process_batch(batch, job['mould_id'], requeue_summary), job)
+                    # 追加到结果日志，合并时覆盖该商品在批量修改阶段的结果
+                    size = self.results.append([(index, record.item_id, record.result) for record in batch])
+                    self.journal.append({"type": "verify", "results": size})
+            verification['success'] = requeue_summary['success']
+            verification['fail'] = requeue_summary['fail']
+
+            if not self.stop_requested:
+                remaining, recheck_errors, recheck_truncated = self._find_stragglers(jobs, list(resubmit), claimed)
+                verification['errors'] += recheck_errors
+                # 重新提交后仍未改好的商品 (接口可能报告成功却未生效) 在结果中标记为失败，已失败的商品保留原失败原因
+                submitted = {record.item_id for records in resubmit.values() for record in records}
+                left = [(index, record.item_id, STILL_WRONG_RESULT)
+                        for (index, _), records in remaining.items() for record in records
+                        if record.item_id in submitted]
+                if left:
+                    size = self.results.append(left)
+                    self.journal.append({"type": "verify", "results": size})
+                # 超出翻页深度的商品仍在其他模板下 (只是没有逐条列出)，计入未改好
+                verification['remaining'] += len(left) + recheck_truncated
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="verify") as pool:
+            futures = [pool.submit(self._count_items, job['price_min'], job['price_max'],
+                                   shipping_mould=job['mould_id']) for job in jobs]
+            for job, future in zip(jobs, futures):
+                job['verified'] = future.result()
+
+        self.log(f"复核完成: 仍使用其他运费模板 {found} 条，重新修改成功 {verification['success']} 条、"
+                 f"失败 {verification['fail']} 条，复核后仍未改好 {verification['remaining']} 条",
+                 "WARNING" if verification['remaining'] or verification['errors'] or truncated else "INFO")
+        if truncated:
+            self.log(f"有 {truncated} 条商品超出翻页深度，未复核也未重新提交", "WARNING")
+        return verification
+
+    def _load_update_results(self, jobs):
+        """
+        批量修改阶段的结果，复核时用于跳过已失败的商品
+        流水线模式的结果直接写在区间导出文件中，此时只从导出文件收集失败的商品
+        :return: ResultIndex
+        """
+        if not self.pipeline:
+            return self.results.load()
+        results = ResultIndex()
+        for index, job in enumerate(jobs):
+            if not job['count'] or not os.path.exists(job['path']):
+                continue
+            with closing(self.sink_class.read(job['path'])) as reader:
+                for record in reader:
+                    if (record.result or '').startswith(FAILED_RESULT):
+                        results.add(index, record.item_id, record.result)
+        return results
+
+    def _find_stragglers(self, jobs, units, claimed):
+        """
+        并发查询每组 (区间序号, 运费模板 ID) 中的商品，即区间内仍使用该 (非目标) 模板的商品
+        已按其他区间处理的跨区间重复商品不计入；一组超过 SPLIT_THRESHOLD 条时与获取时一样按价格二分成子区间，
+        价格已无法再分的子区间只查前 MAX_PAGE_DEPTH 页，其余计为超出翻页深度未复核
+        :param claimed: {itemId: 采用的区间序号}
+        :return: ({(区间序号, 运费模板 ID): ItemRecord 列表}, 查询失败的组数, 超出翻页深度未复核的条数)
+        """
+        def query_range(index, mould_id, price_min, price_max, split=True):
+            """:return: (ItemRecord 列表, 未复核的条数)，查询失败时为 None"""
+            job = jobs[index]
+            target = int(job['mould_id'])
+            records = []
+            truncated = 0
+            page, pages = 1, 1
+            while page <= pages and not self.stop_requested:
+                success, res = self._get_page_with_retry(price_min, price_max, page, shipping_mould=mould_id)
+                if not success:
+                    self.log(f"复核 [{price_min}-{price_max}] 运费模板 {mould_id} 失败 (page {page}): {res}", "WARNING")
+                    return None
+                pager, item_list = res
+                total = pager.get("total", 0)
+                if page == 1 and total > SPLIT_THRESHOLD:
+                    ranges = self._split_range(price_min, price_max, total, shipping_mould=mould_id) if split else []
+                    if len(ranges) > 1:
+                        parts = [query_range(index, mould_id, low, high, split=False) for low, high in ranges]
+                        if any(part is None for part in parts):
+                            return None
+                        return [r for part, _ in parts for r in part], sum(n for _, n in parts)
+                    truncated = total - SPLIT_THRESHOLD
+                    self.log(f"复核 [{price_min}-{price_max}] 运费模板 {mould_id}: {total} 条超过 {SPLIT_THRESHOLD} 条且"
+                             f"价格无法再拆分，只复核前 {MAX_PAGE_DEPTH} 页，其余 {truncated} 条未复核", "WARNING")
+                if not item_list:
+                    break
+                records.extend(record for record in item_list
+                               if record.mould_id != target and claimed.get(record.item_id, index) == index)
+                pages = min(pager.get("pages", 0), MAX_PAGE_DEPTH)
+                page += 1
+            return records, truncated
+
+        def query(unit):
+            index, mould_id = unit
+            return query_range(index, mould_id, jobs[index]['price_min'], jobs[index]['price_max'])
+
+        stragglers = {}
+        errors = 0
+        truncated = 0
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="verify") as pool:
+            for unit, result in zip(units, pool.map(query, units)):
+                if result is None:
+                    errors += 1
+                else:
+                    stragglers[unit], skipped = result
+                    truncated += skipped
+        return stragglers, errors, truncated
+
+    def _verification_lines(self, jobs):
+        """结果.txt 中的复核部分"""
+        v = self.verification
+        lines = ["-" * 40, f"复核 (按运费模板查询 {v['queries']} 组):"]
+        lines.append(f"仍使用其他模板: {v['found']} 条 (其中批量修改已失败、未重新提交 {v['failed']} 条)，"
+                     f"重新修改成功 {v['success']} 条，失败 {v['fail']} 条")
+        lines.append(f"复核后仍未改好: {v['remaining']} 条")
+        if v['errors']:
+            lines.append(f"查询失败: {v['errors']} 组 (这些组未复核)")
+        if v['truncated']:
+            lines.append(f"超出翻页深度未复核: {v['truncated']} 条 (价格相同的商品过多，无法按价格拆分)")
+        for job in jobs:
+            verified = "查询失败" if job.get('verified') is None else f"{job['verified']} 条"
+            lines.append(f"- [{job['range']}] {job['mould']}: 已使用目标模板 {verified}")
+        lines.append("未设置运费模板的商品无法按模板查询，不在复核范围内")
+        return lines
+
+    def _apply_to_store(self, success_ids, job):
+        """修改成功的商品同步更新到本地库，下次规划时不必重新下载"""
+        if self.store and success_ids:
+            self.store.set_mould(self.account, success_ids, job['mould_id'], job['mould'])
+
+    def _is_unchanged(self, record, mould_id):
+        """商品已使用目标运费模板，无需提交修改"""
+        return self.skip_unchanged and record.mould_id is not None and record.mould_id == int(mould_id)
+
+    def _get_page(self, price_min, price_max, page, **filters):
+        """
+        获取一页商品并在请求线程中转为 ItemRecord，在途的分页只占用紧凑的记录，不保留接口返回的完整 JSON
+        :return: (bool, (pager, ItemRecord 列表) / 错误信息)
+        """
+        success, res = self.api.get_unsold_list(price_min, price_max, page=page, size=PAGE_SIZE, **filters)
+        if not success:
+            return False, res
+        page_data = res.get("productInfoPageResult", {})
+        records = []
+        for item in page_data.get("list", []):
+            try:
+                records.append(ItemRecord.from_dict(item))
+            except (KeyError, TypeError, ValueError):
+                logger.warning("跳过 itemId 无效的商品: %s", item.get('itemId'))
+        return True, (page_data.get("pager", {}), records)
+
+    def _get_page_with_retry(self, price_min, price_max, page, **filters):
+        """
+        获取一页商品，失败时最多重试 PAGE_RETRIES 次；退避由限速器在下一次请求前完成，这里不另外等待
+        :return: 同 _get_page，全部失败时为最后一次的错误信息
+        """
+        for attempt in range(PAGE_RETRIES + 1):
+            success, res = self._get_page(price_min, price_max, page, **filters)
+            if success or self.stop_requested:
+                break
+            if attempt < PAGE_RETRIES:
+                logger.warning("获取商品列表失败 (page %s)，重试第 %d 次: %s", page, attempt + 1, res)
+        return success, res
+
+    def _fetch_range(self, price_min, price_max, on_page, start_page=1, workers=None, **filters):
+        """
+        获取一个价格区间的全部商品，每获取一页调用一次 on_page(page, ItemRecord 列表)
+        filters 为 get_unsold_list 的其余筛选参数 (运费模板、更新/创建时间)
+        首页 (续跑时为 start_page) 串行获取以拿到总页数，其余分页交给线程池并发获取，
+        按页码顺序回调；同时在途的请求数限制为线程数的 2 倍，避免结果堆积在内存。
+        :param workers: 该区间的并发线程数，默认 fetch_workers
+        :return: (获取到的商品条数, 是否完整获取到最后一页)
+        """
+        success, res = self._get_page_with_retry(price_min, price_max, start_page, **filters)
+        if not success:
+            self.log(f"获取商品列表失败 (page {start_page}): {res}", "ERROR")
+            return 0, False
+
+        pager, item_list = res
+        total_pages = pager.get("pages", 0)
+        label = f"{price_min}-{price_max}" if price_min or price_max else "全部商品"
+        # 续跑时已获取的页不计入
+        self.emit(RANGE_STARTED, label=label, pages=total_pages,
+                  total=max(0, pager.get("total", 0) - (start_page - 1) * PAGE_SIZE))
+        if not item_list:
+            self.log(f"  已获取并保存第 {start_page}/{total_pages} 页，此区间累积 0 条")
+            return 0, True
+
+        try:
+            on_page(start_page, item_list)
+        except Exception as e:
+            self.log(f"保存 CSV 页面数据失败: {e}")
+            return 0, False
+        self.emit(PAGE_FETCHED, label=label, items=len(item_list))
+        total_items_count = len(item_list)
+        self.log(f"  已获取并保存第 {start_page}/{total_pages} 页，此区间累积 {total_items_count} 条")
+
+        if start_page >= total_pages:
+            return total_items_count, True
+
+        workers = workers or self.fetch_workers
+        window = workers * 2
+        next_page = start_page + 1
+        pending = deque()
+        finished = False
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+            while not self.stop_requested:
+                while next_page <= total_pages and len(pending) < window:
+                    future = pool.submit(self._get_page_with_retry, price_min, price_max, next_page, **filters)
+                    pending.append((next_page, future))
+                    next_page += 1
+                if not pending:
+                    finished = True
+                    break
+
+                page, future = pending.popleft()
+                success, res = future.result()
+                if not success:
+                    self.log(f"获取商品列表失败 (page {page}): {res}", "ERROR")
+                    break
+
+                _, item_list = res
+                if not item_list:
+                    # 商品在获取过程中减少，后续页已无数据
+                    self.log(f"  已获取并保存第 {page}/{total_pages} 页，此区间累积 {total_items_count} 条")
+                    finished = True
+                    break
+
+                try:
+                    on_page(page, item_list)
+                except Exception as e:
+                    self.log(f"保存 CSV 页面数据失败: {e}")
+                    break
+                self.emit(PAGE_FETCHED, label=label, items=len(item_list))
+                total_items_count += len(item_list)
+                self.log(f"  已获取并保存第 {page}/{total_pages} 页，此区间累积 {total_items_count} 条")
+
+            for _, future in pending:
+                future.cancel()
+
+        return total_items_count, finished
+
+    def _process_batch(self, batch, mould_id, total_summary):
+        """
+        执行单批次更新，结果写入每个记录的 result 字段
+        :param batch: ItemRecord 列表，同一批次的商品可能来自多个区间
+        :return: 修改成功的 itemId 列表
+        """
+        item_ids = [record.item_id for record in batch]
+        results, extra_calls = self._update_with_retry(item_ids, mould_id)
+
+        success_count = sum(1 for r in results.values() if r == '成功')
+        fail_count = len(item_ids) - success_count
+        batch_result_msg = f"成功 {success_count} 件，失败 {fail_count} 件"
+        if extra_calls:
+            batch_result_msg += f" (重试/拆分 {extra_calls} 次)"
         self.log(f"  批次更新完毕: {batch_result_msg}")
         
-        # 写入结果
-        for item in batch:
-            iid = str(item['itemId'])
+        for record in batch:
+            record.result = results.get(str(record.item_id), '失败')
+        # 流水线模式下多个线程共用汇总计数
+        with self._result_lock:
+            total_summary['success'] += success_count
+            total_summary['fail'] += fail_count
+        self.emit(BATCH_UPDATED, items=len(batch), success=success_count, fail=fail_count)
+        return [record.item_id for record in batch if record.result == '成功']
+
+    def _update_with_retry(self, item_ids, mould_id):
+        """
+        调用批量修改，失败的部分放入重试队列
+        - 网络错误、超时、HTTP 错误 (含 429)：与具体商品无关，整批重试 (限速器已退避)，不拆分，
+          每批最多重试 TRANSPORT_RETRIES 次
+        - 与具体商品无关的业务错误 (BATCH_ERROR_CODES，如运费模板不存在)：不拆分，整批记为失败
+        - 其他整批报错：对半拆分后分别重试，直到定位出单个有问题的商品，好商品只多花 O(log n) 次请求；
+          每批拆分出的请求最多 MAX_SPLIT_CALLS 次
+        - 接口返回的 failIds：单独组成批次重试
+        单个商品最多尝试 MAX_ATTEMPTS 次
+        :return: ({itemId(str): 结果}, 额外请求次数)
+        """
+        # 默认 0.5
+        weight = '0.5'
+        results = {}
+        retry_queue = deque([(item_ids, 1)])
+        calls = 0
+        split_calls = 0
+        transport_failures = 0
+
+        def fail_all(ids, message):
+            for iid in ids:
+                results[str(iid)] = f"失败: {message}"
+
+        while retry_queue:
+            ids, attempt = retry_queue.popleft()
+            if self.stop_requested and calls:
+                # 已停止：剩余待重试的商品不再请求
+                fail_all(ids, "任务已停止")
+                continue
+
+            success, res = self.api.batch_update_freight(ids, mould_id, weight)
+            calls += 1
+
             if success:
+                success_ids = {str(x) for x in res.get('successIds', [])}
+                fail_ids = {str(x) for x in res.get('failIds', [])}
+                # 兼容处理：API 没有明确给出 successIds/failIds 时认为当前批次请求的都成功了
                 if not success_ids and not fail_ids:
-                    item['result'] = '成功'
+                    success_ids = {str(x) for x in ids}
+                failed = []
+                for iid in ids:
+                    if str(iid) in success_ids:
+                        results[str(iid)] = '成功'
+                    else:
+                        failed.append(iid)
+                if failed:
+                    if attempt < MAX_ATTEMPTS:
+                        retry_queue.append((failed, attempt + 1))
+                    else:
+                        for iid in failed:
+                            results[str(iid)] = '失败'
+            elif getattr(res, 'transport', False):
+                transport_failures += 1
+                if transport_failures <= TRANSPORT_RETRIES:
+                    retry_queue.appendleft((ids, attempt))
                 else:
-                    item['result'] = '成功' if iid in success_ids else '失败'
+                    fail_all(ids, res)
+            elif getattr(res, 'err_code', None) in BATCH_ERROR_CODES:
+                fail_all(ids, res)
+            elif len(ids) > 1 and split_calls + 2 <= MAX_SPLIT_CALLS:
+                mid = len(ids) // 2
+                retry_queue.append((ids[:mid], attempt))
+                retry_queue.append((ids[mid:], attempt))
+                split_calls += 2
+            elif len(ids) == 1 and attempt < MAX_ATTEMPTS:
+                retry_queue.append((ids, attempt + 1))
             else:
-                item['result'] = batch_result_msg
-            writer.writerow(item)
-
+                fail_all(ids, res)
+        return results, calls - 1
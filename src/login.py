@@ -1,10 +1,19 @@
+import os
 import requests
 import json
+from .session import SessionCache
 from .utils import logger
 
+# 登录接口地址，可通过环境变量指向本地模拟服务 (scripts/mock_kfz_server.py)
+LOGIN_BASE_URL = os.environ.get("KFZ_LOGIN_BASE_URL", "https://login.kongfz.com")
+
 class LoginManager:
-    def __init__(self):
+    def __init__(self, session_cache=None):
+        """
+        :param session_cache: 登录会话缓存，默认保存在 data/sessions/
+        """
         self.session = requests.Session()
+        self.session_cache = session_cache or SessionCache()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
             'Accept': 'application/json, text/plain, */*',
@@ -20,7 +29,7 @@ class LoginManager:
         :param password: 密码
         :return: (bool, str) - (成功与否, 消息/错误信息)
         """
-        login_url = 'https://login.kongfz.com/Pc/Login/account'
+        login_url = f'{LOGIN_BASE_URL}/Pc/Login/account'
         params = {
             'loginName': username,
             'loginPass': password,
@@ -32,7 +41,7 @@ class LoginManager:
             # 清除旧 cookie
             self.session.cookies.clear()
             
-            logger.info(f"正在尝试登录用户: {username} ...")
+            logger.info("正在尝试登录用户: %s ...", username)
             response = self.session.post(login_url, data=params, timeout=15)
             
             if response.status_code == 200:
@@ -51,16 +60,44 @@ class LoginManager:
                     err_msg = res_json.get('errInfo', '未知错误')
                     if res_json.get("errCode"):
                          err_msg = f"{res_json.get('errCode')}: {err_msg}"
-                    logger.error(f"登录失败: {err_msg}")
+                    logger.error("登录失败: %s", err_msg)
                     return False, err_msg
             else:
-                logger.error(f"登录请求失败: {response.status_code}")
+                logger.error("登录请求失败: %s", response.status_code)
                 return False, f"HTTP Error: {response.status_code}"
 
         except Exception as e:
-            logger.error(f"登录异常: {e}")
+            logger.error("登录异常: %s", e)
             return False, str(e)
 
+    def restore_session(self, username, password):
+        """
+        从缓存恢复该账号上次登录的 cookie，不发送请求；会话是否仍有效需调用方请求一次接口确认
+        :return: 是否恢复了 PHPSESSID
+        """
+        cookies = self.session_cache.load(username, password)
+        if not cookies or not any(c["name"] == "PHPSESSID" for c in cookies):
+            return False
+        self.session.cookies.clear()
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"),
+                                     expires=c.get("expires"), secure=c.get("secure", False))
+        logger.info("已恢复账号 %s 保存的登录会话", username)
+        return True
+
+    def save_session(self, username, password):
+        """把当前 session 的 cookie 加密保存到缓存，下次运行时复用"""
+        cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                    "expires": c.expires, "secure": bool(c.secure)} for c in self.session.cookies]
+        try:
+            self.session_cache.save(username, password, cookies)
+        except OSError as e:
+            logger.warning("保存登录会话失败: %s", e)
+
+    def clear_session(self, username):
+        """删除该账号缓存的会话 (会话已失效且重新登录失败时)"""
+        self.session_cache.clear(username)
+
     def get_cookies(self):
         """
         获取当前 session 的 cookies 字典
@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 延迟直方图的桶上界 (毫秒)，按 1.2 倍递增，覆盖 1ms ~ 数分钟，相对误差不超过 20%
+LATENCY_BOUNDS_MS = [1.2 ** i for i in range(70)]
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图，分位数取所在桶的上界"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(LATENCY_BOUNDS_MS, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max_ms, LATENCY_BOUNDS_MS[i]) if i < len(LATENCY_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 1) if self.total else 0.0,
+            "p50_ms": round(self.percentile(0.50), 1),
+            "p95_ms": round(self.percentile(0.95), 1),
+            "p99_ms": round(self.percentile(0.99), 1),
+            "max_ms": round(self.max_ms, 1)
+        }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.throttle_wait = 0.0
+        self.latency = LatencyHistogram()
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "throttle_wait_seconds": round(self.throttle_wait, 2),
+            "latency": self.latency.to_dict()
+        }
+
+
+class RunMetrics:
+    """
+    一次任务的性能指标：
+    - endpoints: 各接口的请求数、错误数、流量、延迟分布、限速等待时间
+    - phases: 获取/修改阶段的商品数与耗时；修改阶段的商品数只含实际提交的商品，跳过的 (无需修改/重复) 另计
+    - timers: 本地 I/O 等耗时累计 (秒)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.phases = {}
+        self.timers = {}
+
+    def _endpoint(self, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+        return self.endpoints[name]
+
+    def record_request(self, endpoint, latency, ok, bytes_sent=0, bytes_received=0):
+        with self.lock:
+            stats = self._endpoint(endpoint)
+            stats.requests += 1
+            stats.errors += 0 if ok else 1
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.latency.add(latency * 1000)
+
+    def record_wait(self, endpoint, seconds):
+        with self.lock:
+            self._endpoint(endpoint).throttle_wait += seconds
+
+    def record_phase(self, name, items, seconds, skipped=0):
+        """
+        :param items: 阶段内处理的商品数 (用于计算 条/秒)
+        :param skipped: 阶段内跳过、未发出请求的商品数，不计入 items
+        """
+        with self.lock:
+            phase = self.phases.setdefault(name, {"items": 0, "skipped": 0, "seconds": 0.0})
+            phase["items"] += items
+            phase["skipped"] += skipped
+            phase["seconds"] += seconds
+
+    @contextmanager
+    def timed(self, name):
+        """累计代码块耗时到 timers[name]"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.timers[name] = self.timers.get(name, 0.0) + elapsed
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "endpoints": {name: s.to_dict() for name, s in self.endpoints.items()},
+                "phases": {
+                    name: {
+                        "items": p["items"],
+                        "skipped": p["skipped"],
+                        "seconds": round(p["seconds"], 2),
+                        "items_per_sec": round(p["items"] / p["seconds"], 1) if p["seconds"] else 0.0
+                    } for name, p in self.phases.items()
+                },
+                "timers": {name: round(v, 2) for name, v in self.timers.items()}
+            }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def summary_lines(self):
+        """追加到 结果.txt 的简要性能摘要"""
+        data = self.to_dict()
+        lines = ["性能指标:"]
+        names = {"fetch": "获取", "update": "修改", "pipeline": "流水线", "verify": "复核"}
+        for name, p in data["phases"].items():
+            line = f"- {names.get(name, name)}: {p['items']} 条 / {p['seconds']} 秒 = {p['items_per_sec']} 条/秒"
+            if p['skipped']:
+                line += f" (另跳过 {p['skipped']} 条，未提交修改)"
+            lines.append(line)
+        for name, e in data["endpoints"].items():
+            lat = e["latency"]
+            lines.append(
+                f"- 接口 {name}: 请求 {e['requests']} 次, 错误 {e['errors']} 次, "
+                f"延迟 p50/p95/p99 = {lat['p50_ms']}/{lat['p95_ms']}/{lat['p99_ms']} ms, "
+                f"限速等待 {e['throttle_wait_seconds']} 秒, 接收 {e['bytes_received'] // 1024} KB")
+        timers = {"csv_write": "本地 CSV 写入", "results_write": "结果日志写入"}
+        for name, seconds in data["timers"].items():
+            lines.append(f"- {timers.get(name, name)}: {seconds} 秒")
+        return lines
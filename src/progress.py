@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+
+# 进度事件类型
+PLANNED = "planned"                # 预检得到的待获取商品总数
+RANGE_STARTED = "range_started"    # 开始获取一个区间 (拿到首页后，total 为该区间待获取的商品数)
+PAGE_FETCHED = "page_fetched"      # 获取到一页商品
+UPDATE_STARTED = "update_started"  # 开始批量修改，total 为待处理的商品数
+BATCH_UPDATED = "batch_updated"    # 一个批次处理完成 (含跳过的 "无需修改" 商品)
+
+# 计算实时速度的时间窗口 (秒)
+RATE_WINDOW = 30
+
+
+class ProgressEvent:
+    """
+    FreightBatchProcessor 通过 progress_callback 发出的进度事件
+    :param kind: 事件类型，见本模块常量
+    :param label: 区间或文件名，用于显示
+    :param items: 本次事件涉及的商品数
+    :param total: RANGE_STARTED / UPDATE_STARTED 时的待处理总数
+    """
+
+    def __init__(self, kind, label="", items=0, total=0, pages=0, success=0, fail=0, skipped=0):
+        self.kind = kind
+        self.label = label
+        self.items = items
+        self.total = total
+        self.pages = pages
+        self.success = success
+        self.fail = fail
+        self.skipped = skipped
+
+    def __repr__(self):
+        return f"ProgressEvent({self.kind}, label={self.label!r}, items={self.items}, total={self.total})"
+
+
+class ProgressTracker:
+    """
+    汇总进度事件，计算总体百分比、获取/修改的实时速度 (最近 RATE_WINDOW 秒) 与预计剩余时间
+    获取阶段的总数来自预检，没有预检时随各区间开始逐步得知；修改阶段总数未知时 (流水线模式) 按获取总数估算
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fetch_total = 0
+        self.planned = False
+        self.fetched = 0
+        self.update_total = None
+        self.updated = 0
+        self.current = ""
+        self._rates = {"fetch": deque(), "update": deque()}
+
+    def _record_rate(self, phase, items, now):
+        samples = self._rates[phase]
+        samples.append((now, items))
+        while samples and now - samples[0][0] > RATE_WINDOW:
+            samples.popleft()
+
+    def _rate(self, phase, now):
+        samples = self._rates[phase]
+        if not samples or now - samples[-1][0] > RATE_WINDOW:
+            return 0.0
+        elapsed = max(now - samples[0][0], 1.0)
+        return sum(items for _, items in samples) / elapsed
+
+    def apply(self, event):
+        now = time.monotonic()
+        with self.lock:
+            if event.kind == PLANNED:
+                self.fetch_total = event.total
+                self.planned = True
+            elif event.kind == RANGE_STARTED:
+                # 已有预检总数时不再累加各区间的总数
+                if not self.planned:
+                    self.fetch_total += event.total
+                self.current = event.label
+            elif event.kind == PAGE_FETCHED:
+                self.fetched += event.items
+                self._record_rate("fetch", event.items, now)
+            elif event.kind == UPDATE_STARTED:
+                self.update_total = event.total
+                self.current = event.label
+            elif event.kind == BATCH_UPDATED:
+                self.updated += event.items
+                self._record_rate("update", event.items, now)
+                if event.label:
+                    self.current = event.label
+
+    def snapshot(self):
+        """
+        :return: dict(percent, fetch_rate, update_rate, eta (秒，无法估算时为 None), current)
+        """
+        now = time.monotonic()
+        with self.lock:
+            fetch_total = max(self.fetch_total, self.fetched)
+            update_total = max(self.update_total if self.update_total is not None else fetch_total, self.updated)
+            fetch_rate = self._rate("fetch", now)
+            update_rate = self._rate("update", now)
+            done = self.fetched + self.updated
+            total = fetch_total + update_total
+            percent = 100.0 * done / total if total else 0.0
+
+            fetch_left = fetch_total - self.fetched
+            update_left = update_total - self.updated
+            eta = None
+            if fetch_left and fetch_rate and not update_left:
+                eta = fetch_left / fetch_rate
+            elif update_rate and not fetch_left:
+                eta = update_left / update_rate
+            elif fetch_rate and update_left:
+                # 两个阶段都未完成：修改速度未知时按获取速度估算
+                eta = fetch_left / fetch_rate + update_left / (update_rate or fetch_rate)
+            return {
+                "percent": percent,
+                "fetched": self.fetched,
+                "updated": self.updated,
+                "fetch_rate": fetch_rate,
+                "update_rate": update_rate,
+                "eta": eta,
+                "current": self.current
+            }
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+
+# 各类接口的默认速率 (请求/秒)：(初始, 下限, 上限)
+DEFAULT_RATES = {
+    "list": (2.0, 0.2, 8.0),
+    "update": (1.0, 0.1, 4.0),
+}
+
+
+class TokenBucket:
+    """
+    自适应令牌桶
+    - 连续成功 increase_every 次后速率加 increase_step (加性增)
+    - 失败时速率乘以 decrease_factor (乘性减)，并按指数退避 + 随机抖动暂停发放令牌
+    - 业务错误 (接口正常返回了 errCode) 与请求速率无关，只短暂退避 business_backoff 秒，不降速、不累计连续失败次数
+    - 连续失败次数在下一次成功时清零
+    """
+
+    def __init__(self, rate, min_rate, max_rate, capacity=None,
+                 increase_step=0.2, increase_every=10, decrease_factor=0.5,
+                 backoff_base=1.0, backoff_max=60.0, business_backoff=0.5):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.increase_step = increase_step
+        self.increase_every = increase_every
+        self.decrease_factor = decrease_factor
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.business_backoff = business_backoff
+
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.success_streak = 0
+        self.failure_streak = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self.tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def on_success(self):
+        with self.lock:
+            self.failure_streak = 0
+            self.success_streak += 1
+            if self.success_streak >= self.increase_every:
+                self.success_streak = 0
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+                self.capacity = max(1.0, self.rate)
+
+    def on_failure(self, slow_down=True):
+        """
+        :param slow_down: 是否降低速率；接口正常返回了业务错误 (如个别商品导致整批失败) 时为 False，
+            只按 business_backoff 固定短暂退避，拆分定位问题商品时不会越等越久
+        """
+        with self.lock:
+            if not slow_down:
+                backoff = self.business_backoff * random.uniform(0.5, 1.0)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + backoff)
+                return backoff
+            self.success_streak = 0
+            self.failure_streak += 1
+            if slow_down:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, 0.0)
+
+            backoff = min(self.backoff_max, self.backoff_base * (2 ** (self.failure_streak - 1)))
+            # 抖动，避免多个线程同时恢复请求
+            backoff *= random.uniform(0.5, 1.0)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + backoff)
+            return backoff
+
+
+class AdaptiveRateLimiter:
+    """
+    按接口类别 (list / update) 分别限速的限速器，同一账号的所有 KfzClient 共用一个实例
+    """
+
+    def __init__(self, rates=None):
+        rates = rates or DEFAULT_RATES
+        self.buckets = {kind: TokenBucket(*r) for kind, r in rates.items()}
+
+    def acquire(self, kind):
+        self.buckets[kind].acquire()
+
+    def on_success(self, kind):
+        self.buckets[kind].on_success()
+
+    def on_failure(self, kind, slow_down=True):
+        return self.buckets[kind].on_failure(slow_down)
+
+    def current_rate(self, kind):
+        return self.buckets[kind].rate
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(account):
+    """获取账号对应的共享限速器"""
+    with _limiters_lock:
+        if account not in _limiters:
+            _limiters[account] = AdaptiveRateLimiter()
+        return _limiters[account]
@@ -0,0 +1,89 @@
+import sys
+from .bands import to_cents
+
+# 导出文件的字段，result 列在批量修改阶段回填
+EXPORT_FIELDS = ['itemId', 'itemSn', 'name', 'qualityName', 'quality', 'price',
+                 'realPrice', 'mouldId', 'mouldName', 'weight', 'result']
+
+
+def _to_int(value):
+    """itemId / mouldId 转为整数，空值为 None"""
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _to_cents(value):
+    """价格转为以分为单位的整数 (用于按区间查找)，空值或无法解析时为 None"""
+    if value is None or value == '':
+        return None
+    try:
+        return to_cents(value)
+    except ValueError:
+        return None
+
+
+def _shared(value):
+    """运费模板名、品相、价格等重复很多的字符串共用同一个对象，不必每个商品各存一份"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ItemRecord:
+    """
+    获取、去重、批量修改全程使用的商品记录，只保存导出的 10 个字段与修改结果
+    接口返回的商品 JSON 有几十个字段，每页在请求线程中即转为 ItemRecord，原始 dict 不再保留；
+    itemId / mouldId 为整数，价格保留接口返回的原值 (导出与原格式一致)，按区间查找时再换算为分；
+    __slots__ 不为每个对象分配 __dict__
+    """
+    __slots__ = ('item_id', 'item_sn', 'name', 'quality_name', 'quality', 'price', 'real_price',
+                 'mould_id', 'mould_name', 'weight', 'update_time', 'result')
+
+    def __init__(self, item_id, item_sn='', name='', quality_name='', quality='', price='',
+                 real_price='', mould_id=None, mould_name='', weight='', update_time='', result=''):
+        self.item_id = item_id
+        self.item_sn = item_sn
+        self.name = name
+        self.quality_name = quality_name
+        self.quality = quality
+        self.price = price
+        self.real_price = real_price
+        self.mould_id = mould_id
+        self.mould_name = mould_name
+        self.weight = weight
+        self.update_time = update_time # 只用于本地商品库，不导出
+        self.result = result
+
+    @classmethod
+    def from_dict(cls, item):
+        """
+        由接口返回的商品或导出文件中读出的行 (字段名相同) 创建
+        :raises (KeyError, ValueError): 缺少 itemId 或 itemId 不是整数
+        """
+        return cls(
+            int(item['itemId']),
+            item.get('itemSn', ''),
+            item.get('name', ''),
+            _shared(item.get('qualityName', '')),
+            _shared(item.get('quality', '')),
+            _shared(item.get('price', '')),
+            _shared(item.get('realPrice', '')),
+            _to_int(item.get('mouldId')),
+            _shared(item.get('mouldName', '')),
+            _shared(item.get('weight', '')),
+            item.get('updateTime', ''),
+            item.get('result') or ''
+        )
+
+    @property
+    def price_cents(self):
+        """以分为单位的价格，无法解析时为 None"""
+        return _to_cents(self.price)
+
+    def values(self):
+        """按 EXPORT_FIELDS 顺序的导出值"""
+        return (self.item_id, self.item_sn, self.name, self.quality_name, self.quality, self.price,
+                self.real_price, '' if self.mould_id is None else self.mould_id,
+                self.mould_name, self.weight, self.result)
+
+    def to_dict(self):
+        return dict(zip(EXPORT_FIELDS, self.values()))
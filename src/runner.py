@@ -0,0 +1,244 @@
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing.managers import SyncManager
+from .utils import logger
+
+# 同时运行的账号 (进程) 数上限
+MAX_PROCESSES = 4
+# 多账号任务目录下的汇总报告
+REPORT_FILENAME = "汇总.txt"
+REPORT_JSON_FILENAME = "summary.json"
+# 账号文件中每个账号可以单独设置的 FreightBatchProcessor 参数
+ACCOUNT_OPTIONS = ("fetch_workers", "pipeline", "update_workers", "single_pass", "skip_unchanged", "mould_filter",
+                   "use_store", "full_sync", "merge_results", "output_format", "reuse_session",
+                   "refresh_catalog", "verify")
+RESULT_KEYS = ("success", "fail", "skipped", "duplicate")
+
+
+def load_accounts(path):
+    """
+    读取多账号任务文件 (JSON 列表)，模板路径相对于该文件所在目录
+    [{"username": "店铺A", "password": "...", "template": "A.csv", "options": {"single_pass": true}}, ...]
+    :return: (bool, 账号任务列表 / 错误信息)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return False, f"读取账号文件失败: {e}"
+    if not isinstance(data, list) or not data:
+        return False, "账号文件应为非空的 JSON 列表"
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    seen = set()
+    for i, entry in enumerate(data, 1):
+        if not isinstance(entry, dict) or not all(entry.get(k) for k in ("username", "password", "template")):
+            return False, f"第 {i} 个账号缺少 username / password / template"
+        # 同一账号共用一个限速额度，拆到多个进程会超出限速
+        if entry["username"] in seen:
+            return False, f"账号 {entry['username']} 重复"
+        seen.add(entry["username"])
+        options = entry.get("options", {})
+        unknown = set(options) - set(ACCOUNT_OPTIONS)
+        if unknown:
+            return False, f"账号 {entry['username']} 的选项不支持: {', '.join(sorted(unknown))}"
+        jobs.append({
+            "username": entry["username"],
+            "password": entry["password"],
+            "template": os.path.join(base_dir, entry["template"]),
+            "options": options
+        })
+    return True, jobs
+
+
+def safe_dirname(name):
+    """账号名转为可用作目录名的字符串"""
+    return "".join("_" if c in '<>:"/\\|?*' or ord(c) < 32 else c for c in name).strip(" .") or "_"
+
+
+def _ignore_interrupt():
+    """子进程忽略 Ctrl+C (会发给整个进程组)，统一由主进程通过 stop_event 停止"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_account(job, output_root, events, stop_event):
+    """
+    在子进程中运行一个账号的任务：独立的 session、限速器、输出目录与结果汇总
+    日志与进度事件经 events 队列交给主进程
+    """
+    from .logic import FreightBatchProcessor
+    from .utils import setup_logger
+
+    username = job["username"]
+    setup_logger(stream=sys.stderr, tag=username)
+    processor = FreightBatchProcessor(
+        log_callback=lambda message, level: events.put(("log", username, level, message)),
+        progress_callback=lambda event: events.put(("progress", username, event)),
+        output_root=output_root,
+        **job["options"]
+    )
+
+    def watch_stop():
+        stop_event.wait()
+        processor.stop()
+    threading.Thread(target=watch_stop, daemon=True).start()
+
+    started = datetime.now()
+    try:
+        ok = processor.run(job["template"], username, job["password"])
+        error = None
+    except Exception as e:
+        logger.exception("账号任务异常")
+        ok, error = False, str(e)
+    return {
+        "username": username,
+        "ok": bool(ok),
+        "stopped": processor.stop_requested,
+        "error": error,
+        "run_dir": processor.run_dir,
+        "summary": {k: processor.summary.get(k, 0) for k in RESULT_KEYS},
+        "seconds": round((datetime.now() - started).total_seconds(), 1)
+    }
+
+
+class MultiAccountRunner:
+    """
+    多账号并发：每个 (账号, 模板) 在进程池中独立运行，互不共享 session、限速额度和输出目录
+    输出目录为 output/多账号-<时间>/<账号>/<任务时间>，全部结束后在多账号目录下写入汇总报告
+    """
+
+    def __init__(self, jobs, max_processes=MAX_PROCESSES, log_callback=None, progress_callback=None,
+                 output_root="output"):
+        """
+        :param jobs: load_accounts 返回的账号任务列表
+        :param log_callback: 日志回调 (message, level)，子进程的日志带 [账号] 前缀
+        :param progress_callback: 进度回调 (账号, ProgressEvent)
+        """
+        self.jobs = jobs
+        self.max_processes = max(1, min(int(max_processes), len(jobs)))
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.output_root = output_root
+        self.batch_dir = None
+        self.results = []
+        self.stop_requested = False
+
+    def log(self, message, level="INFO"):
+        if level == "INFO":
+            logger.info(message)
+        elif level == "WARNING":
+            logger.warning(message)
+        elif level == "ERROR":
+            logger.error(message)
+
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def stop(self):
+        # 只设置标记 (可能在信号处理函数中调用)，由 run 的循环通知各子进程
+        self.stop_requested = True
+
+    def _dispatch(self, message):
+        if message[0] == "log":
+            # 子进程已写入自己的日志文件，这里只转给界面
+            _, username, level, text = message
+            if self.log_callback:
+                self.log_callback(f"[{username}] {text}", level)
+        elif message[0] == "progress" and self.progress_callback:
+            self.progress_callback(message[1], message[2])
+
+    def run(self):
+        """
+        :return: 各账号的结果列表 (与 jobs 顺序相同)
+        """
+        self.stop_requested = False
+        start_time = datetime.now()
+        self.batch_dir = os.path.join(self.output_root, f"多账号-{start_time.strftime('%Y%m%d%H%M%S')}")
+        os.makedirs(self.batch_dir, exist_ok=True)
+        self.log(f"多账号任务开始: {len(self.jobs)} 个账号，同时运行 {self.max_processes} 个")
+        self.log(f"输出目录: {self.batch_dir}")
+
+        # spawn 启动子进程：各平台行为一致，且不会复制主进程中的线程与 session
+        context = multiprocessing.get_context("spawn")
+        manager = SyncManager(ctx=context)
+        manager.start(_ignore_interrupt)
+        with manager:
+            events = manager.Queue()
+            stop_event = manager.Event()
+            # 每个账号使用新的子进程：日志 handler (按账号命名的日志文件与前缀) 与限速器等模块级状态只在进程内配置一次，
+            # 复用进程会让后一个账号沿用前一个账号的日志文件
+            with ProcessPoolExecutor(max_workers=self.max_processes, mp_context=context,
+                                     initializer=_ignore_interrupt, max_tasks_per_child=1) as pool:
+                futures = [pool.submit(_run_account, job, os.path.join(self.batch_dir, safe_dirname(job["username"])),
+                                       events, stop_event) for job in self.jobs]
+                while not all(f.done() for f in futures):
+                    if self.stop_requested and not stop_event.is_set():
+                        stop_event.set()
+                    try:
+                        self._dispatch(events.get(timeout=0.2))
+                    except queue.Empty:
+                        pass
+                self.results = []
+                for job, future in zip(self.jobs, futures):
+                    try:
+                        self.results.append(future.result())
+                    except Exception as e:
+                        # 子进程异常退出 (如被系统杀死)
+                        self.results.append({"username": job["username"], "ok": False, "stopped": False,
+                                             "error": str(e), "run_dir": None,
+                                             "summary": dict.fromkeys(RESULT_KEYS, 0), "seconds": 0})
+            while not events.empty():
+                self._dispatch(events.get())
+
+        report = self._write_report(start_time, self.stop_requested)
+        self.log(f"\n{report}")
+        return self.results
+
+    def _write_report(self, start_time, stopped):
+        """写入 汇总.txt 与 summary.json，返回汇总文本"""
+        end_time = datetime.now()
+        totals = {k: sum(r["summary"][k] for r in self.results) for k in RESULT_KEYS}
+        lines = []
+        lines.append("=" * 40)
+        lines.append("多账号任务汇总")
+        lines.append("=" * 40)
+        lines.append(f"开始时间: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        lines.append(f"结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        lines.append(f"总耗时: {str(end_time - start_time).split('.')[0]}")
+        lines.append(f"账号数: {len(self.results)}，全部完成: {sum(1 for r in self.results if r['ok'])}")
+        lines.append(f"成功总数: {totals['success']}")
+        lines.append(f"失败总数: {totals['fail']}")
+        lines.append(f"无需修改: {totals['skipped']}")
+        lines.append(f"跨区间重复: {totals['duplicate']}")
+        lines.append("-" * 40)
+        lines.append("各账号:")
+        for r in self.results:
+            status = "完成" if r["ok"] else ("已停止" if r["stopped"] else "失败")
+            if r["error"]:
+                status += f" ({r['error']})"
+            s = r["summary"]
+            lines.append(f"- {r['username']}: {status}，成功 {s['success']}，失败 {s['fail']}，"
+                         f"无需修改 {s['skipped']}，重复 {s['duplicate']}，耗时 {r['seconds']} 秒")
+            if r["run_dir"]:
+                lines.append(f"  输出目录: {r['run_dir']}")
+        if stopped:
+            lines.append("-" * 40)
+            lines.append("任务已停止，可在各账号的输出目录断点续跑。")
+        lines.append("=" * 40)
+        report = "\n".join(lines)
+
+        with open(os.path.join(self.batch_dir, REPORT_FILENAME), 'w', encoding='utf-8-sig') as f:
+            f.write(report)
+        with open(os.path.join(self.batch_dir, REPORT_JSON_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump({"start_time": start_time.isoformat(timespec="seconds"),
+                       "end_time": end_time.isoformat(timespec="seconds"),
+                       "totals": totals, "accounts": self.results}, f, ensure_ascii=False, indent=2)
+        return report
@@ -0,0 +1,116 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import timedelta
+
+# 登录会话缓存目录，每个账号一个文件 (文件名为账号的哈希，不含账号明文)
+SESSION_DIR = os.path.join("data", "sessions")
+# 超过该时长的会话不再尝试复用，直接重新登录
+SESSION_MAX_AGE = timedelta(days=7)
+# 由账号密码派生加密密钥的迭代次数 (PBKDF2-HMAC-SHA256)
+KDF_ITERATIONS = 100_000
+SESSION_VERSION = 1
+
+
+def _derive_keys(password, salt):
+    """由密码与随机盐派生 (加密密钥, 校验密钥)"""
+    key = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, KDF_ITERATIONS, dklen=64)
+    return key[:32], key[32:]
+
+
+def _keystream(key, nonce, length):
+    # SHAKE-256 以 密钥 + 随机数 为输入生成密钥流 (标准库即可，不引入额外依赖)
+    return hashlib.shake_256(key + nonce).digest(length)
+
+
+def _xor(data, stream):
+    return bytes(a ^ b for a, b in zip(data, stream))
+
+
+def encrypt(plaintext, password):
+    """
+    用密码加密数据：PBKDF2 派生密钥，SHAKE-256 密钥流加密，HMAC-SHA256 校验 (先加密后校验)
+    :return: 可写入 JSON 的字典
+    """
+    salt, nonce = os.urandom(16), os.urandom(16)
+    enc_key, mac_key = _derive_keys(password, salt)
+    data = _xor(plaintext, _keystream(enc_key, nonce, len(plaintext)))
+    tag = hmac.new(mac_key, salt + nonce + data, hashlib.sha256).digest()
+    return {name: base64.b64encode(value).decode("ascii")
+            for name, value in (("salt", salt), ("nonce", nonce), ("data", data), ("tag", tag))}
+
+
+def decrypt(payload, password):
+    """
+    :return: 明文；密码不对 (账号改过密码) 或文件被改动时返回 None
+    """
+    try:
+        salt, nonce, data, tag = (base64.b64decode(payload[name]) for name in ("salt", "nonce", "data", "tag"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    enc_key, mac_key = _derive_keys(password, salt)
+    if not hmac.compare_digest(tag, hmac.new(mac_key, salt + nonce + data, hashlib.sha256).digest()):
+        return None
+    return _xor(data, _keystream(enc_key, nonce, len(data)))
+
+
+class SessionCache:
+    """
+    按账号保存登录后的 cookie (PHPSESSID 等)，下次运行时直接复用，省去登录请求
+    文件用账号密码加密，只有知道密码才能读出 cookie；会话是否仍有效由调用方请求一次接口确认
+    """
+
+    def __init__(self, directory=SESSION_DIR):
+        self.directory = directory
+
+    def path(self, username):
+        name = hashlib.sha256(username.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.session")
+
+    def load(self, username, password):
+        """
+        :return: cookie 列表 [{"name", "value", "domain", "path", "expires", "secure"}]；
+            没有缓存、已过期或无法解密时返回 None
+        """
+        try:
+            with open(self.path(username), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get("version") != SESSION_VERSION:
+            return None
+        if time.time() - payload.get("saved_at", 0) > SESSION_MAX_AGE.total_seconds():
+            return None
+        plaintext = decrypt(payload, password)
+        if plaintext is None:
+            return None
+        try:
+            data = json.loads(plaintext)
+        except ValueError:
+            return None
+        if data.get("username") != username:
+            return None
+        now = time.time()
+        return [c for c in data.get("cookies", []) if not c.get("expires") or c["expires"] > now]
+
+    def save(self, username, password, cookies):
+        """加密保存 cookie 列表；写临时文件后替换，文件权限仅限当前用户"""
+        os.makedirs(self.directory, exist_ok=True)
+        plaintext = json.dumps({"username": username, "cookies": cookies}, ensure_ascii=False).encode("utf-8")
+        payload = {"version": SESSION_VERSION, "saved_at": int(time.time())}
+        payload.update(encrypt(plaintext, password))
+        path = self.path(username)
+        tmp_path = path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def clear(self, username):
+        try:
+            os.remove(self.path(username))
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+import csv
+import json
+import os
+import sqlite3
+from .records import EXPORT_FIELDS, ItemRecord
+
+# 文本导出文件的写缓冲大小，每页商品先写入缓冲区，只在断点处 flush + fsync
+WRITE_BUFFER = 1024 * 1024
+# SQLite 合并结果时每次更新的行数
+MERGE_CHUNK = 5000
+
+
+class ExportSink:
+    """
+    区间导出文件的基类：任务期间每个区间只打开一次，按页追加写入
+    - write(records): 追加若干 ItemRecord
+    - flush(sync): 把缓冲写入文件，sync 为 True 时同时 fsync；返回断点位置，续跑时 truncate 到该位置
+    - read(path) / truncate(path, position) / merge(path, lookup): 不需要打开 sink 的类方法
+    """
+    extension = ""
+
+    def __init__(self, path, append=False):
+        self.path = path
+
+    def write(self, records):
+        raise NotImplementedError
+
+    def flush(self, sync=False):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    @classmethod
+    def read(cls, path):
+        """按写入顺序逐行读取为 ItemRecord"""
+        raise NotImplementedError
+
+    @classmethod
+    def truncate(cls, path, position):
+        """丢弃断点位置之后写入的数据"""
+        if os.path.getsize(path) > position:
+            with open(path, 'r+b') as f:
+                f.truncate(position)
+
+    @classmethod
+    def merge(cls, path, lookup):
+        """
+        把修改结果写入 result 列：流式写入 .tmp 后替换原文件
+        :param lookup: lookup(ItemRecord) -> 结果
+        """
+        temp_path = path + ".tmp"
+        sink = cls(temp_path)
+        try:
+            for record in cls.read(path):
+                record.result = lookup(record)
+                sink.write([record])
+            sink.flush(sync=True)
+        finally:
+            sink.close()
+        os.replace(temp_path, path)
+
+
+class TextSink(ExportSink):
+    """逐行写入的文本文件，断点位置为已写入的字节数"""
+    encoding = 'utf-8'
+
+    def __init__(self, path, append=False):
+        super().__init__(path, append)
+        self.file = open(path, 'a' if append else 'w', encoding=self.encoding, newline='', buffering=WRITE_BUFFER)
+
+    def flush(self, sync=False):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        return os.fstat(self.file.fileno()).st_size
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSink(TextSink):
+    """CSV (utf-8-sig，Windows Excel 直接打开不乱码)，与原导出格式相同"""
+    extension = ".csv"
+    encoding = 'utf-8-sig'
+
+    def __init__(self, path, append=False):
+        super().__init__(path, append)
+        self.writer = csv.writer(self.file)
+        if not append or self.file.tell() == 0:
+            self.writer.writerow(EXPORT_FIELDS)
+
+    def write(self, records):
+        self.writer.writerows(record.values() for record in records)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'r', encoding=cls.encoding, newline='') as f:
+            for row in csv.DictReader(f):
+                yield ItemRecord.from_dict(row)
+
+
+class JsonlSink(TextSink):
+    """JSON Lines，每行一个商品，适合用脚本处理"""
+    extension = ".jsonl"
+
+    def write(self, records):
+        self.file.write("".join(json.dumps(record.to_dict(), ensure_ascii=False) + "\n" for record in records))
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'r', encoding=cls.encoding, newline='') as f:
+            for line in f:
+                if line.strip():
+                    yield ItemRecord.from_dict(json.loads(line))
+
+
+class SqliteSink(ExportSink):
+    """
+    SQLite，每个区间一个库文件，商品在 items 表中 (seq 为写入顺序，itemId/mouldId 建索引)
+    多次任务的结果可以 ATTACH 后直接用 SQL 查询、关联，不必在 Excel 中打开大 CSV
+    断点位置为已写入的行数
+    """
+    extension = ".sqlite3"
+    # itemId、价格等数值列使用 NUMERIC 亲和类型，便于按数值筛选排序
+    NUMERIC_FIELDS = ('itemId', 'price', 'realPrice', 'mouldId', 'weight')
+
+    def __init__(self, path, append=False):
+        super().__init__(path, append)
+        if not append and os.path.exists(path):
+            os.remove(path)
+        # 子区间并发获取时由不同线程写入，调用方保证同一时刻只有一个线程使用
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f"{k} {'NUMERIC' if k in self.NUMERIC_FIELDS else 'TEXT'}" for k in EXPORT_FIELDS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS items (seq INTEGER PRIMARY KEY, {columns});
+            CREATE INDEX IF NOT EXISTS idx_items_item ON items (itemId);
+            CREATE INDEX IF NOT EXISTS idx_items_mould ON items (mouldId);
+        """)
+        self.rows = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM items").fetchone()[0]
+
+    def write(self, records):
+        values = []
+        for record in records:
+            self.rows += 1
+            values.append((self.rows, *record.values()))
+        self.conn.executemany(f"INSERT INTO items VALUES ({', '.join('?' * (len(EXPORT_FIELDS) + 1))})", values)
+
+    def flush(self, sync=False):
+        # 默认 synchronous=FULL，提交即落盘
+        self.conn.commit()
+        return self.rows
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    @classmethod
+    def read(cls, path):
+        conn = sqlite3.connect(path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM items ORDER BY seq")
+            for values in cursor:
+                yield cls._record(values)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _record(values):
+        return ItemRecord.from_dict({k: '' if v is None else v for k, v in zip(EXPORT_FIELDS, values)})
+
+    @classmethod
+    def truncate(cls, path, position):
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM items WHERE seq > ?", (position,))
+        finally:
+            conn.close()
+
+    @classmethod
+    def merge(cls, path, lookup):
+        """直接按块更新 result 列，不重写整个文件"""
+        conn = sqlite3.connect(path)
+        try:
+            last = 0
+            while True:
+                values = conn.execute(f"SELECT seq, {', '.join(EXPORT_FIELDS)} FROM items WHERE seq > ? "
+                                      f"ORDER BY seq LIMIT {MERGE_CHUNK}", (last,)).fetchall()
+                if not values:
+                    break
+                with conn:
+                    conn.executemany("UPDATE items SET result = ? WHERE seq = ?", [
+                        (lookup(cls._record(row[1:])), row[0])
+                        for row in values])
+                last = values[-1][0]
+        finally:
+            conn.close()
+
+
+# 可选的导出格式
+OUTPUT_FORMATS = {"csv": CsvSink, "jsonl": JsonlSink, "sqlite": SqliteSink}
+
+
+def get_sink_class(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {output_format}")
+    return OUTPUT_FORMATS[output_format]
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from .bands import to_cents
+from .records import ItemRecord
+
+# 本地商品库位置，所有账号共用一个库，按 account 列区分
+STORE_PATH = os.path.join("data", "items.sqlite3")
+# 接口时间筛选参数的格式
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 增量同步时向前多取的时间，覆盖服务端与本机的时钟误差
+SYNC_OVERLAP = timedelta(minutes=10)
+# 距上次完整同步超过该时长时重新完整同步，清理已售出/下架的商品
+FULL_SYNC_INTERVAL = timedelta(days=7)
+
+STORE_FIELDS = ['itemId', 'itemSn', 'name', 'qualityName', 'quality', 'price',
+                'realPrice', 'mouldId', 'mouldName', 'weight', 'updateTime']
+
+
+class ItemStore:
+    """
+    出售中商品的本地 SQLite 库
+    itemId 为主键，price (以分为单位的整数) 与 mouldId 建索引，按价格区间规划修改时直接查本地库
+    """
+
+    def __init__(self, path=STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                account TEXT NOT NULL,
+                itemId INTEGER NOT NULL,
+                itemSn TEXT,
+                name TEXT,
+                qualityName TEXT,
+                quality TEXT,
+                price TEXT,
+                price_cents INTEGER,
+                realPrice TEXT,
+                mouldId INTEGER,
+                mouldName TEXT,
+                weight TEXT,
+                updateTime TEXT,
+                synced_at TEXT,
+                PRIMARY KEY (account, itemId)
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_price ON items (account, price_cents);
+            CREATE INDEX IF NOT EXISTS idx_items_mould ON items (account, mouldId);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                account TEXT PRIMARY KEY,
+                last_sync TEXT,
+                last_full_sync TEXT
+            );
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def get_sync_state(self, account):
+        """
+        :return: (上次同步时间, 上次完整同步时间)，从未同步时为 (None, None)
+        """
+        row = self.conn.execute(
+            "SELECT last_sync, last_full_sync FROM sync_state WHERE account = ?", (account,)).fetchone()
+        if not row:
+            return None, None
+        return tuple(datetime.strptime(v, TIME_FORMAT) if v else None for v in row)
+
+    def set_sync_state(self, account, synced_at, full):
+        value = synced_at.strftime(TIME_FORMAT)
+        with self.conn:
+            if full:
+                self.conn.execute(
+                    "INSERT INTO sync_state (account, last_sync, last_full_sync) VALUES (?, ?, ?) "
+                    "ON CONFLICT(account) DO UPDATE SET last_sync = excluded.last_sync, "
+                    "last_full_sync = excluded.last_full_sync", (account, value, value))
+            else:
+                self.conn.execute(
+                    "INSERT INTO sync_state (account, last_sync) VALUES (?, ?) "
+                    "ON CONFLICT(account) DO UPDATE SET last_sync = excluded.last_sync", (account, value))
+
+    def upsert(self, account, records, synced_at):
+        """写入/更新一页商品 (ItemRecord)"""
+        stamp = synced_at.strftime(TIME_FORMAT)
+        rows = [(account, r.item_id, r.item_sn, r.name, r.quality_name, r.quality, r.price,
+                 r.real_price, r.mould_id, r.mould_name, r.weight, r.update_time,
+                 r.price_cents, stamp) for r in records]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO items (account, {', '.join(STORE_FIELDS)}, price_cents, synced_at) "
+                f"VALUES ({', '.join('?' * (len(STORE_FIELDS) + 3))})", rows)
+
+    def remove_stale(self, account, synced_at):
+        """完整同步后删除本次未出现的商品 (已售出或下架)"""
+        with self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM items WHERE account = ? AND synced_at < ?", (account, synced_at.strftime(TIME_FORMAT)))
+        return cur.rowcount
+
+    def query_band(self, account, price_min, price_max, exclude_mould=None):
+        """
+        按价格区间 (闭区间) 查询商品 (ItemRecord)，按 itemId 排序
+        :param exclude_mould: 排除已使用该运费模板的商品
+        """
+        low = to_cents(price_min, upper=False)
+        high = to_cents(price_max, upper=True)
+        sql = f"SELECT {', '.join(STORE_FIELDS)} FROM items WHERE account = ? AND price_cents BETWEEN ? AND ?"
+        params = [account, low, high]
+        if exclude_mould is not None:
+            sql += " AND mouldId != ?"
+            params.append(int(exclude_mould))
+        sql += " ORDER BY itemId"
+        cursor = self.conn.execute(sql, params)
+        for row in cursor:
+            yield ItemRecord.from_dict({k: '' if v is None else v for k, v in zip(STORE_FIELDS, row)})
+
+    def set_mould(self, account, item_ids, mould_id, mould_name):
+        """批量修改成功后同步更新本地库中的运费模板"""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE items SET mouldId = ?, mouldName = ? WHERE account = ? AND itemId = ?",
+                [(int(mould_id), mould_name, account, int(iid)) for iid in item_ids])
+
+    def count(self, account):
+        return self.conn.execute("SELECT COUNT(*) FROM items WHERE account = ?", (account,)).fetchone()[0]
+
+
+def sync_window(last_sync, now):
+    """增量同步的时间窗口 (起, 止)，起点向前多取 SYNC_OVERLAP"""
+    return (last_sync - SYNC_OVERLAP).strftime(TIME_FORMAT), now.strftime(TIME_FORMAT)
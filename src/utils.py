@@ -1,44 +1,141 @@
+import atexit
 import logging
-import sys
 import os
+import queue
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOGGER_NAME = "kfz_freight_editor"
+# 日志目录，相对于当前工作目录
+LOG_DIR = "logs"
+# 单个日志文件的大小上限，超过后滚动为 app_<日期>.log.1 ... (保留 LOG_BACKUP_COUNT 个)
+LOG_MAX_BYTES = 20 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# 超过该天数的日志文件在换日时删除
+LOG_RETENTION_DAYS = 30
+# 日志级别的环境变量，设为 DEBUG 时记录请求数据等详细内容 (命令行也可以用 --debug)
+LOG_LEVEL_ENV = "KFZ_LOG_LEVEL"
+LOG_FORMAT = '%(asctime)s | %(levelname)s | {prefix}%(message)s'
+
+# 导入时只取得 logger，不创建日志目录和 handler；由程序入口 (GUI / 命令行) 调用 setup_logger 配置
+logger = logging.getLogger(LOGGER_NAME)
+# 后台写日志的线程，setup_logger 时启动，进程退出时停止并写完队列中剩余的日志
+_listener = None
+
+
+class DailyRotatingFileHandler(RotatingFileHandler):
+    """
+    按日期命名的日志文件 (app_<日期>[_<后缀>].log)：日期变化时切换到新文件并清理过期日志，
+    同一天内超过 max_bytes 时按大小滚动
+    """
+
+    def __init__(self, directory, suffix="", max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+        self.directory = directory
+        self.suffix = suffix
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        super().__init__(self._path(self.date), maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+
+    def _path(self, date):
+        return os.path.join(self.directory, f"app_{date}{self.suffix}.log")
+
+    def shouldRollover(self, record):
+        return datetime.now().strftime("%Y-%m-%d") != self.date or super().shouldRollover(record)
+
+    def doRollover(self):
+        date = datetime.now().strftime("%Y-%m-%d")
+        if date == self.date:
+            super().doRollover()
+            return
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.date = date
+        self.baseFilename = os.path.abspath(self._path(date))
+        self._remove_expired()
+
+    def _remove_expired(self):
+        cutoff = time.time() - timedelta(days=LOG_RETENTION_DAYS).total_seconds()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("app_") and ".log" in name and os.path.getmtime(path) < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
-def setup_logger(name="kfz_freight_editor", level=logging.INFO):
-    """配置并返回一个 logger，日志存放在 logs/ 目录，按日期命名"""
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
 
-    # 根据日期生成文件名
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    log_file = os.path.join(log_dir, f"app_{date_str}.log")
+class LocalQueueHandler(QueueHandler):
+    """
+    只把日志记录放入队列，格式化与文件/控制台 I/O 都在后台线程完成
+    监听线程在同一进程内，不需要像 QueueHandler 默认那样在调用线程提前格式化消息
+    (因此日志参数在记录后不应再被修改)
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logger(name=LOGGER_NAME, level=None, stream=sys.stdout, tag=None, use_queue=True):
+    """
+    配置并返回一个 logger，日志存放在 logs/ 目录，按日期命名，按日期与大小滚动
+    :param level: 日志级别，默认读取环境变量 KFZ_LOG_LEVEL，未设置时为 INFO
+    :param stream: 控制台输出的流，命令行模式下 stdout 用于输出进度，日志改写到 stderr
+    :param tag: 每行日志的前缀 (如多账号并发时的账号)；多个进程同时运行时各自写入 app_<日期>_<tag>.log
+    :param use_queue: 调用线程只把日志放入队列，由后台线程写文件和控制台；为 False 时同步写入
+    """
+    global _listener
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV, "INFO").upper()
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
     # 避免重复添加 handler
     if not logger.handlers:
+        prefix = f"[{tag}] ".replace('%', '%%') if tag else ""
+        formatter = logging.Formatter(LOG_FORMAT.format(prefix=prefix))
+        suffix = "_" + "".join(c if c.isalnum() else "_" for c in tag) if tag else ""
+
         # 文件处理器
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(level)
-        file_formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
-        file_handler.setFormatter(file_formatter)
+        file_handler = DailyRotatingFileHandler(LOG_DIR, suffix=suffix)
+        file_handler.setFormatter(formatter)
 
         # 控制台处理器
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(level)
-        console_formatter = logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
-        console_handler.setFormatter(console_formatter)
+        console_handler = logging.StreamHandler(stream)
+        console_handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        if use_queue:
+            log_queue = queue.SimpleQueue()
+            logger.addHandler(LocalQueueHandler(log_queue))
+            _listener = QueueListener(log_queue, file_handler, console_handler)
+            _listener.start()
+            atexit.register(shutdown_logger)
+        else:
+            logger.addHandler(file_handler)
+            logger.addHandler(console_handler)
 
     return logger
 
+
+def shutdown_logger():
+    """停止后台写日志的线程，队列中剩余的日志写完后返回"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def open_directory(path):
     """跨平台打开目录"""
     if not os.path.exists(path):
         return False, f"目录不存在: {path}"
-    
+
     try:
         if sys.platform == 'win32':
             os.startfile(path)
@@ -49,7 +146,3 @@ def open_directory(path):
         return True, "成功"
     except Exception as e:
         return False, str(e)
-
-import subprocess
-from datetime import datetime
-logger = setup_logger()
@@ -0,0 +1,48 @@
+"""结果日志 (ResultJournal / ResultIndex) 的测试"""
+import os
+import tempfile
+import unittest
+
+from src.journal import RunJournal, ResultIndex, ResultJournal
+
+
+class ResultIndexTest(unittest.TestCase):
+    def test_later_result_wins(self):
+        index = ResultIndex()
+        index.add(0, "1", "失败: 商品状态异常")
+        index.add(0, "2", "成功")
+        # 复核重新修改的结果追加在后面
+        index.add(0, "1", "成功")
+        index.add(0, "2", "失败: 复核后仍使用其他运费模板")
+        self.assertEqual(index.get(0, "1"), "成功")
+        self.assertEqual(index.get(0, "2"), "失败: 复核后仍使用其他运费模板")
+        self.assertEqual(index.get(0, "3"), "")
+        self.assertTrue(index.has_job(0))
+        self.assertFalse(index.has_job(1))
+
+
+class ResultJournalTest(unittest.TestCase):
+    def test_resume_keeps_verify_results(self):
+        with tempfile.TemporaryDirectory() as run_dir:
+            results = ResultJournal(run_dir)
+            journal = RunJournal(run_dir)
+            size = results.append([(0, "1", "失败: 商品状态异常"), (0, "2", "成功")])
+            journal.append({"type": "batch", "job": 0, "rows": 2, "results": size})
+            size = results.append([(0, "1", "成功")])
+            journal.append({"type": "verify", "results": size})
+            # 写了一半、没有记录断点的结果
+            results.append([(0, "2", "失败")])
+            results.close()
+            journal.close()
+
+            state = RunJournal(run_dir).load()
+            self.assertEqual(state.results_size, size)
+            results.truncate(state.results_size)
+            self.assertEqual(os.path.getsize(results.path), size)
+            index = results.load()
+            self.assertEqual(index.get(0, "1"), "成功")
+            self.assertEqual(index.get(0, "2"), "成功")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""批量修改重试/拆分策略 (FreightBatchProcessor._update_with_retry) 的测试，使用不发请求的桩客户端"""
+import unittest
+
+from src.api import ApiError
+from src.logic import MAX_SPLIT_CALLS, TRANSPORT_RETRIES, FreightBatchProcessor
+
+BATCH = list(range(1000, 1200))
+
+
+class StubClient:
+    """按 respond(ids, 第几次请求) 返回结果的桩客户端，只实现 batch_update_freight"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = 0
+
+    def batch_update_freight(self, item_ids, mould_id, item_unit="0.5"):
+        self.calls += 1
+        return self.respond(list(item_ids), self.calls)
+
+
+def poisoned(bad_ids):
+    """批次中有问题商品时整批报错 (与具体商品有关的业务错误)，否则全部成功"""
+    def respond(ids, call):
+        if bad_ids & set(ids):
+            return False, ApiError("商品状态异常，批量修改失败", err_code=2002)
+        return True, {"successIds": [str(i) for i in ids], "failIds": []}
+    return respond
+
+
+def spread(count):
+    """在批次中均匀分布的 count 个问题商品"""
+    step = len(BATCH) // count
+    return {BATCH[step // 2 + k * step] for k in range(count)}
+
+
+class UpdateWithRetryTest(unittest.TestCase):
+
+    def run_batch(self, respond, item_ids=BATCH):
+        processor = FreightBatchProcessor()
+        processor.api = StubClient(respond)
+        results, extra_calls = processor._update_with_retry(item_ids, 1)
+        self.assertEqual(set(results), {str(i) for i in item_ids})
+        self.assertEqual(extra_calls, processor.api.calls - 1)
+        return results, processor.api.calls
+
+    def assert_isolated(self, bad_ids):
+        results, calls = self.run_batch(poisoned(bad_ids))
+        for iid in BATCH:
+            if iid in bad_ids:
+                self.assertTrue(results[str(iid)].startswith("失败"), iid)
+            else:
+                self.assertEqual(results[str(iid)], "成功", iid)
+        self.assertLessEqual(calls, 1 + MAX_SPLIT_CALLS)
+
+    def test_one_bad_item(self):
+        self.assert_isolated(spread(1))
+
+    def test_two_bad_items(self):
+        self.assert_isolated(spread(2))
+
+    def test_four_bad_items_one_per_quarter(self):
+        self.assert_isolated(spread(4))
+
+    def test_eight_bad_items(self):
+        self.assert_isolated(spread(8))
+
+    def test_batch_wide_error_is_not_bisected(self):
+        results, calls = self.run_batch(lambda ids, call: (False, ApiError("运费模板不存在", err_code=2001)))
+        self.assertEqual(calls, 1)
+        self.assertEqual(set(results.values()), {"失败: 运费模板不存在"})
+
+    def test_unknown_error_is_capped(self):
+        results, calls = self.run_batch(lambda ids, call: (False, ApiError("未知错误", err_code=9999)))
+        self.assertLessEqual(calls, 1 + MAX_SPLIT_CALLS + len(BATCH))
+        self.assertNotIn("成功", results.values())
+
+    def test_transport_error_retries_whole_batch(self):
+        sizes = []
+
+        def respond(ids, call):
+            sizes.append(len(ids))
+            if call <= 2:
+                return False, ApiError("429 Too Many Requests", transport=True)
+            return True, {"successIds": [str(i) for i in ids], "failIds": []}
+
+        results, calls = self.run_batch(respond)
+        self.assertEqual(calls, 3)
+        self.assertEqual(sizes, [len(BATCH)] * 3)
+        self.assertEqual(set(results.values()), {"成功"})
+
+    def test_persistent_transport_error_gives_up(self):
+        results, calls = self.run_batch(lambda ids, call: (False, ApiError("timeout", transport=True)))
+        self.assertEqual(calls, 1 + TRANSPORT_RETRIES)
+        self.assertEqual(set(results.values()), {"失败: timeout"})
+
+    def test_fail_ids_are_retried_alone(self):
+        def respond(ids, call):
+            return True, {"successIds": [str(i) for i in ids if i % 50], "failIds": [str(i) for i in ids if not i % 50]}
+
+        results, calls = self.run_batch(respond)
+        self.assertEqual(calls, 2)
+        self.assertEqual(sum(r == "失败" for r in results.values()), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()